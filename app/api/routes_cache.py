@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+from app.schemas.cache import CacheStatsResponse, CacheClearResponse
+from app.core.llm_utils import get_llm_cache
+
+router = APIRouter(prefix="/cache", tags=["cache"])
+
+@router.get("/stats", response_model=CacheStatsResponse)
+def get_cache_stats():
+    """Report hit/miss counters and size of the LLM response cache."""
+    cache = get_llm_cache()
+    if cache is None:
+        return CacheStatsResponse(enabled=False)
+    return CacheStatsResponse(enabled=True, **cache.stats())
+
+@router.delete("/", response_model=CacheClearResponse)
+def clear_cache():
+    """Remove every cached LLM response."""
+    cache = get_llm_cache()
+    if cache is not None:
+        cache.clear()
+    return CacheClearResponse(message="LLM response cache cleared.")
@@ -5,9 +5,9 @@ from fastapi.responses import JSONResponse
 import tempfile
 import shutil
 import os
-from app.core.feature_extractor import extract_features_from_codebase
+from app.core.feature_index import extract_features
 import zipfile
-from app.core.config import SELECTED_MODEL
+from app.core.config import SELECTED_MODEL, UPLOAD_CHUNK_SIZE
 
 router = APIRouter(prefix="/codebase", tags=["codebase"])
 
@@ -21,20 +21,22 @@ def upload_codebase(
     with tempfile.TemporaryDirectory() as tmpdir:
         zip_path = os.path.join(tmpdir, codebase.filename)
         with open(zip_path, 'wb') as f:
-            shutil.copyfileobj(codebase.file, f)
+            shutil.copyfileobj(codebase.file, f, UPLOAD_CHUNK_SIZE)
         # For now, just return success
         return CodebaseUploadResponse(message="Codebase uploaded.", temp_path=zip_path, model_id=active_model_id)
 
 @router.post("/analyze", response_model=CodebaseAnalysisResponse)
-def analyze_codebase(temp_path: str = Form(...), model_id: Optional[str] = Form(None)):
+def analyze_codebase(
+    temp_path: str = Form(...),
+    model_id: Optional[str] = Form(None),
+    project_id: Optional[str] = Form(None)
+):
     active_model_id = model_id or SELECTED_MODEL["id"]
-    # Unzip if needed, then analyze
-    extract_dir = temp_path + "_extracted"
+    # Zips are read member by member without being extracted.
+    # With a project_id only files changed since the last analysis are re-analyzed
     if temp_path.endswith('.zip'):
         with zipfile.ZipFile(temp_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-        base_path = extract_dir
+            features, feature_diff = extract_features(zip_ref, project_id)
     else:
-        base_path = temp_path
-    features = extract_features_from_codebase(base_path)
-    return CodebaseAnalysisResponse(message="Codebase analyzed.", features=features) 
\ No newline at end of file
+        features, feature_diff = extract_features(temp_path, project_id)
+    return CodebaseAnalysisResponse(message="Codebase analyzed.", features=features, feature_diff=feature_diff) 
\ No newline at end of file
@@ -0,0 +1,102 @@
+from fastapi import APIRouter, Form, File, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+import os
+import shutil
+from app.schemas.jobs import JobSubmitResponse, JobStatusResponse, JobResultResponse
+from app.schemas.scripts import ScriptGenerationRequest
+from app.core.config import SELECTED_MODEL, APP_CONTEXT, UPLOAD_CHUNK_SIZE, PAGE_OBJECTS_ENABLED
+from app.core.conftest_gen import build_support_files
+from app.core.page_objects import build_page_objects
+from app.core.jobs import get_job_manager, job_dir, COMPLETED
+from app.utils.file_ops import zip_scripts
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+def _get_job_or_404(job_id: str) -> dict:
+    job = get_job_manager().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    return job
+
+@router.post("/test-plan", response_model=JobSubmitResponse)
+def submit_test_plan_job(
+    codebase: UploadFile = File(...),
+    requirements: str = Form(""),
+    model_id: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    project_id: Optional[str] = Form(None)
+):
+    """Queue test plan generation (same inputs as /test-plan/generate) as a background job."""
+    manager = get_job_manager()
+    params = {
+        "requirements": [r.strip() for r in requirements.split('\n') if r.strip()],
+        "model_id": model_id or SELECTED_MODEL["id"],
+        "app_context": dict(APP_CONTEXT),
+        "use_cache": use_cache,
+        "project_id": project_id,
+    }
+    # Create the job first so the upload can be stored under its id, then start it
+    job_id = manager.store.create("test_plan", params)
+    os.makedirs(job_dir(job_id), exist_ok=True)
+    with open(os.path.join(job_dir(job_id), "codebase.zip"), 'wb') as f:
+        shutil.copyfileobj(codebase.file, f, UPLOAD_CHUNK_SIZE)
+    manager.resume(job_id)
+    return JobSubmitResponse(message="Test plan job submitted.", job_id=job_id)
+
+@router.post("/scripts", response_model=JobSubmitResponse)
+def submit_scripts_job(request: ScriptGenerationRequest):
+    """Queue Selenium script generation (same inputs as /scripts/generate) as a background job."""
+    user_stories_data = request.user_stories
+    if isinstance(user_stories_data, str):
+        user_stories_data = json.loads(user_stories_data)
+    job_id = get_job_manager().submit("scripts", {
+        "user_stories": user_stories_data,
+        "model_id": request.model_id or SELECTED_MODEL["id"],
+        "use_cache": request.use_cache,
+        "app_context": dict(APP_CONTEXT),
+        "features": request.features if isinstance(request.features, list) else None,
+    })
+    return JobSubmitResponse(message="Script generation job submitted.", job_id=job_id)
+
+@router.get("/{job_id}", response_model=JobStatusResponse)
+def get_job_status(job_id: str):
+    """Report a job's status and per-stage progress."""
+    job = _get_job_or_404(job_id)
+    return JobStatusResponse(
+        job_id=job["id"], kind=job["kind"], status=job["status"],
+        progress=job["progress"], error=job["error"]
+    )
+
+@router.get("/{job_id}/result", response_model=JobResultResponse)
+def get_job_result(job_id: str):
+    """Return the job's output so far; partial until the job has completed."""
+    job = _get_job_or_404(job_id)
+    return JobResultResponse(job_id=job_id, status=job["status"], result=get_job_manager().result(job_id))
+
+@router.get("/{job_id}/download")
+def download_job_scripts(job_id: str):
+    """Download the scripts of a completed script generation job as a zip."""
+    job = _get_job_or_404(job_id)
+    if job["kind"] != "scripts" or job["status"] != COMPLETED:
+        raise HTTPException(status_code=409, detail="Only completed script jobs can be downloaded.")
+    app_context = job["params"].get("app_context", APP_CONTEXT)
+    features = job["params"].get("features")
+    page_objects = build_page_objects(features, app_context) if PAGE_OBJECTS_ENABLED and features else None
+    scripts = get_job_manager().result(job_id)
+    zip_path = zip_scripts(
+        scripts,
+        directory=os.path.join(job_dir(job_id), "scripts"),
+        support_files=build_support_files(app_context, page_objects, scripts),
+    )
+    zip_file = open(zip_path, "rb")
+    return StreamingResponse(zip_file, media_type="application/zip", headers={"Content-Disposition": "attachment; filename=selenium_scripts.zip"})
+
+@router.post("/{job_id}/resume", response_model=JobSubmitResponse)
+def resume_job(job_id: str):
+    """Resume a failed or interrupted job from the results it already stored."""
+    _get_job_or_404(job_id)
+    if not get_job_manager().resume(job_id):
+        raise HTTPException(status_code=409, detail="Job has already completed or is in progress.")
+    return JobSubmitResponse(message="Job resumed.", job_id=job_id)
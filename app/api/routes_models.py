@@ -3,9 +3,12 @@ from app.schemas.models import (
     ModelListResponse, 
     ModelSelectionRequest, 
     ModelSelectionResponse, 
-    CurrentModelResponse
+    CurrentModelResponse,
+    RoutingProfileRequest,
+    RoutingProfileResponse,
 )
 from app.core.config import AVAILABLE_MODELS, SELECTED_MODEL
+from app.core.llm_utils import validate_routing_profile
 
 router = APIRouter(prefix="/models", tags=["models"])
 
@@ -28,4 +31,27 @@ def select_model(request: ModelSelectionRequest):
 @router.get("/current", response_model=CurrentModelResponse)
 def get_current_model():
     """Get the currently selected model."""
-    return CurrentModelResponse(selected_model_id=SELECTED_MODEL["id"]) 
\ No newline at end of file
+    return CurrentModelResponse(selected_model_id=SELECTED_MODEL["id"])
+
+@router.get("/profiles", response_model=ModelListResponse)
+def list_routing_profiles():
+    """List the routing profiles, which assign a model (and fallback) to each pipeline stage."""
+    return ModelListResponse(models=[model for model in AVAILABLE_MODELS if 'stages' in model])
+
+@router.post("/profiles", response_model=RoutingProfileResponse)
+def save_routing_profile(request: RoutingProfileRequest):
+    """Add or replace a routing profile; it can then be selected like any other model."""
+    stages = {stage: route.model_dump(exclude_none=True) for stage, route in request.stages.items()}
+    try:
+        validate_routing_profile(stages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    existing = next((model for model in AVAILABLE_MODELS if model['id'] == request.id), None)
+    if existing is not None and 'stages' not in existing:
+        raise HTTPException(status_code=409, detail=f"'{request.id}' is a model, not a routing profile.")
+    profile = {"name": request.name, "id": request.id, "stages": stages}
+    if existing is not None:
+        AVAILABLE_MODELS[AVAILABLE_MODELS.index(existing)] = profile
+    else:
+        AVAILABLE_MODELS.append(profile)
+    return RoutingProfileResponse(message=f"Routing profile saved: {request.id}", profile=profile)
@@ -4,7 +4,10 @@ from app.schemas.scripts import ScriptGenerationRequest, ScriptGenerationRespons
 from app.core.selenium_gen import generate_selenium_scripts
 from app.utils.file_ops import zip_scripts
 import json
-from app.core.config import SELECTED_MODEL
+from collections import Counter
+from app.core.config import SELECTED_MODEL, APP_CONTEXT, PAGE_OBJECTS_ENABLED
+from app.core.conftest_gen import build_support_files
+from app.core.page_objects import build_page_objects
 
 router = APIRouter(prefix="/scripts", tags=["scripts"])
 
@@ -14,19 +17,30 @@ def generate_scripts_endpoint(
 ):
     """
     Receives user stories and generates Selenium scripts.
-    The generated scripts are zipped and returned directly for download.
+    The generated scripts are zipped and returned directly for download, together with
+    a validation_report.json, the suite's shared conftest.py and, when features are
+    given, the pages.py page objects the scripts use; the X-Script-Status header
+    summarises the script statuses.
     """
     user_stories_data = request.user_stories
     if isinstance(user_stories_data, str):
         user_stories_data = json.loads(user_stories_data)
     
     active_model_id = request.model_id or SELECTED_MODEL["id"]
-    scripts = generate_selenium_scripts(user_stories_data, active_model_id)
+    page_objects = None
+    if PAGE_OBJECTS_ENABLED and isinstance(request.features, list):
+        page_objects = build_page_objects(request.features, APP_CONTEXT)
+    scripts = generate_selenium_scripts(user_stories_data, active_model_id, use_cache=request.use_cache,
+                                        page_objects=page_objects)
     
     # After generating, immediately zip them for download
-    zip_path = zip_scripts(scripts)
+    zip_path = zip_scripts(scripts, support_files=build_support_files(APP_CONTEXT, page_objects, scripts))
     zip_file = open(zip_path, "rb")
-    return StreamingResponse(zip_file, media_type="application/zip", headers={"Content-Disposition": "attachment; filename=selenium_scripts.zip"})
+    statuses = Counter(script.get("status", "unknown") for script in scripts)
+    return StreamingResponse(zip_file, media_type="application/zip", headers={
+        "Content-Disposition": "attachment; filename=selenium_scripts.zip",
+        "X-Script-Status": json.dumps(dict(statuses)),
+    })
 
 @router.get("/download")
 def download_scripts(zip_path: str):
@@ -1,55 +1,191 @@
 from fastapi import APIRouter, Form, File, UploadFile, HTTPException
+from fastapi.responses import StreamingResponse
 from typing import Optional
+import json
 import tempfile
 import shutil
 import zipfile
-import os
-from app.core.config import SELECTED_MODEL, APP_CONTEXT
-from app.core.feature_extractor import extract_features_from_codebase
-from app.core.user_story import create_comprehensive_test_plan
+from app.core.config import SELECTED_MODEL, APP_CONTEXT, UPLOAD_CHUNK_SIZE, PAGE_OBJECTS_ENABLED, SELECTOR_VALIDATION
+from app.core.conftest_gen import build_support_files
+from app.core.page_objects import build_page_objects
+from app.core.selector_index import SelectorIndex
+from app.core.feature_index import extract_features
+from app.core.user_story import create_comprehensive_test_plan, iter_comprehensive_test_plan
+from app.core.pipeline import iter_plan_and_scripts
 
 router = APIRouter(prefix="/test-plan", tags=["Test Plan Generation"])
 
+def _open_upload(codebase: UploadFile) -> zipfile.ZipFile:
+    """Opens the uploaded codebase zip in place; members are read on demand, nothing is extracted."""
+    try:
+        return zipfile.ZipFile(codebase.file)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Codebase must be a valid zip file.")
+
+def _spool_upload(codebase: UploadFile):
+    """
+    Copies the upload to a private temp file and opens it as a zip, for handlers that
+    stream their response after the upload itself has been closed.
+    """
+    spooled = tempfile.TemporaryFile()
+    shutil.copyfileobj(codebase.file, spooled, UPLOAD_CHUNK_SIZE)
+    spooled.seek(0)
+    try:
+        return spooled, zipfile.ZipFile(spooled)
+    except zipfile.BadZipFile:
+        spooled.close()
+        raise HTTPException(status_code=400, detail="Codebase must be a valid zip file.")
+
+def _split_requirements(requirements):
+    # Sanitize requirements input
+    if isinstance(requirements, str):
+        return [r.strip() for r in requirements.split('\n') if r.strip()]
+    return requirements
+
 @router.post("/generate", response_model=dict)
 def generate_test_plan(
     codebase: UploadFile = File(...),
     requirements: str = Form(""),
-    model_id: Optional[str] = Form(None)
+    model_id: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    project_id: Optional[str] = Form(None)
 ):
     """
     Generates a comprehensive test plan by analyzing a codebase,
     comparing it against user requirements, and creating a unified
     set of user stories for testing.
+    With a project_id, only files changed since the project's previous upload are
+    re-analyzed and the plan includes the resulting `feature_diff`.
     """
     active_model_id = model_id or SELECTED_MODEL["id"]
     
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zip_path = os.path.join(tmpdir, 'codebase.zip')
-        with open(zip_path, 'wb') as f:
-            shutil.copyfileobj(codebase.file, f)
-        
-        extract_dir = os.path.join(tmpdir, "extracted")
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_dir)
-            
+    with _open_upload(codebase) as zip_ref:
         # 1. Extract features from the codebase
-        features = extract_features_from_codebase(extract_dir)
-        
-        # Sanitize requirements input
-        if isinstance(requirements, str):
-            requirements_list = [r.strip() for r in requirements.split('\n') if r.strip()]
-        else:
-            requirements_list = requirements
+        features, feature_diff = extract_features(zip_ref, project_id)
         
         # 2. Call the new orchestrator to create the test plan
         test_plan = create_comprehensive_test_plan(
-            requirements=requirements_list,
+            requirements=_split_requirements(requirements),
             features=features,
             model_id=active_model_id,
-            app_context=APP_CONTEXT
+            app_context=APP_CONTEXT,
+            use_cache=use_cache,
+            project_id=project_id,
+            feature_diff=feature_diff
         )
         
         if not test_plan or not test_plan.get('backlog'):
             raise HTTPException(status_code=500, detail="Failed to generate a valid test plan.")
-            
-        return test_plan 
\ No newline at end of file
+        
+        if feature_diff is not None:
+            test_plan['feature_diff'] = feature_diff
+        return test_plan
+
+@router.post("/generate/stream")
+def generate_test_plan_stream(
+    codebase: UploadFile = File(...),
+    requirements: str = Form(""),
+    model_id: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    project_id: Optional[str] = Form(None)
+):
+    """
+    Streaming variant of /test-plan/generate. Returns NDJSON: one JSON event per line
+    for progress (extraction, matching, feature stories), each epic and each feature
+    story as soon as it is generated, the plan metadata, and a final "done" event.
+    """
+    active_model_id = model_id or SELECTED_MODEL["id"]
+    requirements_list = _split_requirements(requirements)
+    spooled, zip_ref = _spool_upload(codebase)
+
+    def events():
+        try:
+            yield {"event": "progress", "stage": "extraction", "status": "started"}
+            features, feature_diff = extract_features(zip_ref, project_id)
+            yield {"event": "progress", "stage": "extraction", "status": "completed", "features": len(features)}
+            if feature_diff is not None:
+                yield {"event": "feature_diff", "feature_diff": feature_diff}
+            yield from iter_comprehensive_test_plan(
+                requirements=requirements_list,
+                features=features,
+                model_id=active_model_id,
+                app_context=dict(APP_CONTEXT),
+                use_cache=use_cache,
+                project_id=project_id,
+                feature_diff=feature_diff
+            )
+            yield {"event": "done"}
+        except Exception as e:
+            print(f"Error streaming test plan: {e}")
+            yield {"event": "error", "detail": str(e)}
+        finally:
+            zip_ref.close()
+            spooled.close()
+
+    return StreamingResponse(
+        (json.dumps(event) + "\n" for event in events()),
+        media_type="application/x-ndjson"
+    )
+
+@router.post("/generate/pipeline")
+def generate_test_plan_pipeline(
+    codebase: UploadFile = File(...),
+    requirements: str = Form(""),
+    model_id: Optional[str] = Form(None),
+    use_cache: bool = Form(True),
+    project_id: Optional[str] = Form(None)
+):
+    """
+    End-to-end variant of /test-plan/generate/stream: each story is passed on to script
+    generation as soon as it is produced, so the NDJSON stream also carries a "script"
+    event per story ({"epic", "index", "script"}) while the rest of the plan is still
+    being generated, followed by a "support_files" event with the suite's conftest.py
+    (using the login flow taken out of the scripts) and pages.py (page objects built
+    from the extracted features). Script selectors are
+    checked against an index of the uploaded HTML (reported in a "selector_index" event).
+    """
+    active_model_id = model_id or SELECTED_MODEL["id"]
+    requirements_list = _split_requirements(requirements)
+    spooled, zip_ref = _spool_upload(codebase)
+
+    def events():
+        try:
+            yield {"event": "progress", "stage": "extraction", "status": "started"}
+            features, feature_diff = extract_features(zip_ref, project_id)
+            yield {"event": "progress", "stage": "extraction", "status": "completed", "features": len(features)}
+            if feature_diff is not None:
+                yield {"event": "feature_diff", "feature_diff": feature_diff}
+            app_context = dict(APP_CONTEXT)
+            page_objects = build_page_objects(features, app_context) if PAGE_OBJECTS_ENABLED else None
+            selector_index = None
+            if SELECTOR_VALIDATION:
+                selector_index = SelectorIndex.from_zip(zip_ref)
+                yield {"event": "selector_index", **selector_index.stats()}
+            scripts = []
+            for event in iter_plan_and_scripts(
+                requirements=requirements_list,
+                features=features,
+                model_id=active_model_id,
+                app_context=app_context,
+                use_cache=use_cache,
+                page_objects=page_objects,
+                selector_index=selector_index,
+                project_id=project_id,
+                feature_diff=feature_diff
+            ):
+                if event["event"] == "script":
+                    scripts.append(event["script"])
+                yield event
+            yield {"event": "support_files", "files": build_support_files(app_context, page_objects, scripts)}
+            yield {"event": "done"}
+        except Exception as e:
+            print(f"Error streaming test plan pipeline: {e}")
+            yield {"event": "error", "detail": str(e)}
+        finally:
+            zip_ref.close()
+            spooled.close()
+
+    return StreamingResponse(
+        (json.dumps(event) + "\n" for event in events()),
+        media_type="application/x-ndjson"
+    )
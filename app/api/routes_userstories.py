@@ -13,7 +13,8 @@ def generate_user_stories_endpoint(
     app_pages: Optional[str] = Form(None),
     username: Optional[str] = Form(None),
     password: Optional[str] = Form(None),
-    model_id: Optional[str] = Form(None)
+    model_id: Optional[str] = Form(None),
+    use_cache: bool = Form(True)
 ):
     active_model_id = model_id or SELECTED_MODEL["id"]
     
@@ -28,15 +29,16 @@ def generate_user_stories_endpoint(
             detail="Application URL must be provided either in the request or by setting the app context via POST /app-context."
         )
 
-    user_stories = generate_user_stories(requirements, active_model_id, url, pages, user, pwd)
+    user_stories = generate_user_stories(requirements, active_model_id, url, pages, user, pwd, use_cache=use_cache)
     return UserStoryResponse(message="User stories generated.", user_stories=user_stories)
 
 @router.post("/match", response_model=UserStoryMatchResponse)
 def match_userstories_endpoint(
     requirements: str = Form(...),
     features: str = Form(...),
-    model_id: Optional[str] = Form(None)
+    model_id: Optional[str] = Form(None),
+    use_cache: bool = Form(True)
 ):
     active_model_id = model_id or SELECTED_MODEL["id"]
-    matches = match_requirements_to_features(requirements, features, active_model_id)
+    matches = match_requirements_to_features(requirements, features, active_model_id, use_cache=use_cache)
     return UserStoryMatchResponse(message="Matching complete.", matches=matches) 
\ No newline at end of file
@@ -1,6 +1,24 @@
+import os
+
+# Pipeline stages a routing profile can assign models to
+LLM_STAGES = ["matching", "backlog", "feature_stories", "steps", "code"]
+
 AVAILABLE_MODELS = [
     {"name": "Claude Sonnet 4", "id": "claude"},
-    {"name": "Ollama Llama3", "id": "ollama-llama3"}
+    {"name": "Ollama Llama3", "id": "ollama-llama3"},
+    # Routing profiles: a model (and optional fallback) per stage. "hedge" sends a
+    # duplicate request when the first one is slower than the stage's p95 latency.
+    {
+        "name": "Balanced (local Llama3 for volume, Claude for code)",
+        "id": "balanced",
+        "stages": {
+            "matching": {"model": "claude", "fallback": "ollama-llama3"},
+            "backlog": {"model": "claude", "fallback": "ollama-llama3"},
+            "feature_stories": {"model": "ollama-llama3", "fallback": "claude", "hedge": True},
+            "steps": {"model": "ollama-llama3", "fallback": "claude", "hedge": True},
+            "code": {"model": "claude", "fallback": "ollama-llama3"},
+        },
+    },
 ]
 
 # Simple in-memory state for the selected model
@@ -13,4 +31,150 @@ APP_CONTEXT = {
     "pages": "",
     "username": "",
     "password": ""
-} 
\ No newline at end of file
+} 
+
+# Maximum number of in-flight LLM requests per provider when stories are
+# processed concurrently. Local Ollama servers serialize most work, so keep
+# their limit low; hosted providers can take more parallel requests.
+# For Ollama providers the limit applies per endpoint (see OLLAMA_ENDPOINTS).
+LLM_MAX_CONCURRENCY = {
+    "claude": 8,
+    "ollama": 2,
+    "ollama-llama3": 2,
+}
+DEFAULT_LLM_MAX_CONCURRENCY = 4
+
+# Per-call timeout (seconds) for fanned-out LLM calls such as per-feature story generation.
+LLM_CALL_TIMEOUT = 120
+
+# Number of features packed into a single story-generation prompt (1 disables batching).
+FEATURE_STORY_BATCH_SIZE = 10
+
+# Persistent LLM response cache. Identical prompts sent to the same provider,
+# model, temperature and output format are answered from disk.
+LLM_CACHE_ENABLED = True
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite3"))
+LLM_CACHE_TTL = 7 * 24 * 3600  # seconds; None keeps entries until evicted by size
+LLM_CACHE_MAX_ENTRIES = 50000
+LLM_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Eviction removes least recently used entries down to this fraction of the limits
+LLM_CACHE_LOW_WATER = 0.9
+
+# Background jobs: SQLite state, per-job input files and the size of the worker pool.
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(".cache", "jobs.sqlite3"))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(".cache", "jobs"))
+JOB_MAX_WORKERS = 2
+
+# Codebase feature extraction. Directory and file names matching an ignore glob
+# are skipped, as are files above the size cap. Extraction is sharded across
+# FEATURE_EXTRACTION_WORKERS processes (None = one per core) once a codebase has
+# at least FEATURE_EXTRACTION_PARALLEL_MIN_FILES supported files.
+FEATURE_EXTRACTION_IGNORE = [
+    ".git", "node_modules", "dist", "build", "vendor", "__pycache__", ".venv", "venv",
+    "*.min.js", "*.bundle.js", "*.chunk.js",
+]
+FEATURE_EXTRACTION_MAX_FILE_BYTES = 2 * 1024 * 1024
+FEATURE_EXTRACTION_WORKERS = None
+FEATURE_EXTRACTION_PARALLEL_MIN_FILES = 200
+
+# Persistent per-project feature index used for incremental codebase analysis.
+FEATURE_INDEX_PATH = os.getenv("FEATURE_INDEX_PATH", os.path.join(".cache", "feature_index.sqlite3"))
+
+# Chunk size (bytes) used when copying uploaded codebases.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Local pre-ranking for requirement matching: only the top-k lexical candidates per
+# requirement are sent to the LLM, and requirements whose candidates cover at least
+# FEATURE_MATCH_SKIP_LLM_CONFIDENCE of their distinctive terms are matched locally
+# (None always asks the LLM). Confidence is scaled down for requirements with fewer than
+# FEATURE_MATCH_MIN_TERMS distinctive terms and for candidates whose BM25 score isn't
+# FEATURE_MATCH_MIN_MARGIN (relative) ahead of the next best.
+FEATURE_MATCH_TOP_K = 10
+FEATURE_MATCH_SKIP_LLM_CONFIDENCE = 0.9
+FEATURE_MATCH_MIN_TERMS = 2
+FEATURE_MATCH_MIN_MARGIN = 0.25
+
+# Context window (tokens) per provider. Requirement matching splits its input so each
+# prompt's variable content stays within LLM_PROMPT_CONTEXT_FRACTION of the window,
+# and within LLM_PROMPT_TOKEN_BUDGET when that is set.
+MODEL_CONTEXT_TOKENS = {
+    "claude": 200000,
+    "ollama": 8192,
+    "ollama-llama3": 8192,
+}
+DEFAULT_MODEL_CONTEXT_TOKENS = 8192
+LLM_PROMPT_CONTEXT_FRACTION = 0.5
+LLM_PROMPT_TOKEN_BUDGET = 30000
+
+# Feature snippets longer than this are trimmed when features are written into prompts.
+PROMPT_SNIPPET_MAX_CHARS = 160
+# Form features carry their controls in the snippet, so they get more room.
+PROMPT_FORM_SNIPPET_MAX_CHARS = 480
+
+# Near-duplicate feature clustering before story generation. Features of the same type
+# whose snippets have an estimated Jaccard similarity >= FEATURE_DEDUP_THRESHOLD are
+# collapsed into one representative (MinHash with FEATURE_DEDUP_NUM_PERM permutations,
+# split into FEATURE_DEDUP_BANDS LSH bands).
+FEATURE_DEDUP_ENABLED = True
+FEATURE_DEDUP_THRESHOLD = 0.8
+FEATURE_DEDUP_NUM_PERM = 64
+FEATURE_DEDUP_BANDS = 16
+
+# Compile LLM-generated test steps into pytest code locally; the LLM code call is only
+# used when the steps are missing or invalid.
+COMPILE_STEPS_LOCALLY = True
+
+# How many times a generated script that fails validation (syntax, imports, no test_
+# function) is sent back to the LLM for repair.
+SCRIPT_REPAIR_ATTEMPTS = 1
+
+# Per-provider rate limits enforced before each LLM request (providers not listed are
+# unlimited). LLM_MAX_CONCURRENCY is the ceiling the adaptive concurrency limit grows
+# back to after throttling.
+LLM_REQUESTS_PER_MINUTE = {"claude": 50}
+LLM_TOKENS_PER_MINUTE = {"claude": 40000}
+# Retries of throttled (429/529) and transient failures, with exponential backoff and full jitter
+LLM_MAX_RETRIES = 4
+LLM_BACKOFF_BASE = 1.0
+LLM_BACKOFF_MAX = 30.0
+
+# Ollama servers requests are balanced across (least outstanding requests first, with
+# failover), e.g. OLLAMA_ENDPOINTS="http://gpu1:11434,http://gpu2:11434".
+OLLAMA_ENDPOINTS = [url.strip() for url in os.getenv("OLLAMA_ENDPOINTS", "http://localhost:11434").split(",") if url.strip()]
+# How long Ollama keeps a model loaded after a request; models are preloaded at startup.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+# Seconds before an unreachable Ollama endpoint is health-checked again.
+OLLAMA_HEALTH_CHECK_INTERVAL = 30
+
+# Seconds a routed request may take before it falls back to the stage's fallback model
+LLM_ROUTE_TIMEOUT = 60
+# Hedged requests wait for the stage's p95 latency over the last LLM_HEDGE_WINDOW calls,
+# once at least LLM_HEDGE_MIN_SAMPLES have been seen.
+LLM_HEDGE_WINDOW = 100
+LLM_HEDGE_MIN_SAMPLES = 20
+
+# Stories waiting for script generation in pipeline mode; a full queue pauses plan generation.
+PIPELINE_QUEUE_SIZE = 20
+
+# Worker processes (each with one reusable browser session) for running a generated suite
+SUITE_RUN_WORKERS = 4
+
+# Generated suites share one conftest.py with a session-scoped browser and a login state
+# captured once and restored per test; scripts use its fixtures instead of their own.
+SHARED_CONFTEST = True
+# CSS selectors the shared login fixture uses (editable in the generated conftest.py)
+LOGIN_SELECTORS = {
+    "username_selector": "#username, input[name='username'], input[type='email']",
+    "password_selector": "#password, input[type='password']",
+    "submit_selector": "#login, button[type='submit'], input[type='submit']",
+    "logged_in_selector": "",
+}
+
+# Generate one page-object class per page (pages.py) from the extracted features; story
+# prompts then get the page-object API and compiled scripts call it.
+PAGE_OBJECTS_ENABLED = True
+
+# Check the selectors in generated scripts against an index of the uploaded HTML, and send
+# scripts with unknown selectors back for repair with the closest known ones suggested.
+SELECTOR_VALIDATION = True
+SELECTOR_SUGGESTIONS = 3
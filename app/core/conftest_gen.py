@@ -0,0 +1,200 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+from app.core.config import LOGIN_SELECTORS, SHARED_CONFTEST
+from app.core.page_objects import render_page_objects
+
+_PASSWORD_SELECTOR = re.compile(r'pass|pwd', re.IGNORECASE)
+_LOGIN_STORY = re.compile(r'\b(log ?in|sign ?in|logout|log out|sign out|authenticat\w*|credentials?)\b', re.IGNORECASE)
+
+_TEMPLATE = '''import os
+from urllib.parse import urljoin
+import pytest
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+# Shared fixtures for the generated suite. Override the values below with environment variables.
+APP_URL = os.getenv("APP_URL", {url!r})
+LOGIN_URL = os.getenv("APP_LOGIN_URL", urljoin(APP_URL.rstrip("/") + "/", {login_path!r}))
+USERNAME = os.getenv("APP_USERNAME", {username!r})
+PASSWORD = os.getenv("APP_PASSWORD", {password!r})
+USERNAME_SELECTOR = {username_selector!r}
+PASSWORD_SELECTOR = {password_selector!r}
+SUBMIT_SELECTOR = {submit_selector!r}
+# Element that only shows once logged in (optional)
+LOGGED_IN_SELECTOR = {logged_in_selector!r}
+WAIT_SECONDS = 10
+
+
+def new_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    return webdriver.Chrome(options=options)
+
+
+def login(driver):
+    """Runs the login flow with the app credentials."""
+    driver.get(LOGIN_URL)
+    wait = WebDriverWait(driver, WAIT_SECONDS)
+    field = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, USERNAME_SELECTOR)))
+    field.clear()
+    field.send_keys(USERNAME)
+    field = driver.find_element(By.CSS_SELECTOR, PASSWORD_SELECTOR)
+    field.clear()
+    field.send_keys(PASSWORD)
+    wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, SUBMIT_SELECTOR))).click()
+    if LOGGED_IN_SELECTOR:
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, LOGGED_IN_SELECTOR)))
+    else:
+        wait.until(lambda d: d.execute_script("return document.readyState") == "complete")
+
+
+def capture_state(driver):
+    """The logged-in state of the browser: current URL, cookies, localStorage and sessionStorage."""
+    return {{
+        "url": driver.current_url,
+        "cookies": driver.get_cookies(),
+        "local_storage": driver.execute_script("return Object.assign({{}}, window.localStorage);"),
+        "session_storage": driver.execute_script("return Object.assign({{}}, window.sessionStorage);"),
+    }}
+
+
+def restore_state(driver, state):
+    """Puts a captured logged-in state back into the browser and reloads the page."""
+    driver.get(state["url"])
+    for cookie in state["cookies"]:
+        try:
+            driver.add_cookie(cookie)
+        except Exception:
+            pass
+    driver.execute_script(
+        "for (const [k, v] of Object.entries(arguments[0])) window.localStorage.setItem(k, v);"
+        "for (const [k, v] of Object.entries(arguments[1])) window.sessionStorage.setItem(k, v);",
+        state["local_storage"], state["session_storage"],
+    )
+    driver.refresh()
+
+
+def reset(driver):
+    """Clears cookies and storage and leaves the browser on a blank page."""
+    try:
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except Exception:
+        pass
+    driver.get("about:blank")
+
+
+@pytest.fixture(scope="session")
+def browser():
+    # One browser per session (per worker with pytest-xdist)
+    driver = new_driver()
+    yield driver
+    driver.quit()
+
+
+@pytest.fixture
+def driver(browser):
+    yield browser
+    reset(browser)
+
+
+@pytest.fixture(scope="session")
+def auth_state(browser):
+    # Log in once; every test that needs it gets the captured state restored instead
+    login(browser)
+    state = capture_state(browser)
+    reset(browser)
+    return state
+
+
+@pytest.fixture
+def logged_in_driver(driver, auth_state):
+    restore_state(driver, auth_state)
+    return driver
+'''
+
+
+def has_credentials(app_context: Dict[str, Any]) -> bool:
+    """True when the app context has the username and password the shared login fixture needs."""
+    return bool(app_context.get("username") and app_context.get("password"))
+
+
+def build_conftest(app_context: Dict[str, Any], login: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Renders the suite's conftest.py: a session-scoped browser, a per-test reset and a
+    reusable login state. `login` is the login flow taken out of the scripts' steps (see
+    split_login_steps); its URL and selectors are used, and its credentials when the app
+    context has none.
+    """
+    login = login or {}
+    url = app_context.get("url") or ""
+    login_url = login.get("url") or ""
+    base = url.rstrip("/") + "/"
+    selectors = dict(LOGIN_SELECTORS)
+    selectors.update({key: login[key] for key in ("username_selector", "password_selector", "submit_selector") if login.get(key)})
+    return _TEMPLATE.format(
+        url=url,
+        # Relative to APP_URL (no leading slash) when it's under it, so the runner's APP_URL
+        # applies to it too; otherwise the absolute URL
+        login_path=login_url[len(base):] if url and login_url.startswith(base) else login_url,
+        username=app_context.get("username") or login.get("username") or "",
+        password=app_context.get("password") or login.get("password") or "",
+        **selectors,
+    )
+
+
+def build_support_files(app_context: Dict[str, Any], page_objects: List[Dict[str, Any]] = None,
+                        scripts: List[Dict[str, Any]] = None) -> Dict[str, str]:
+    """
+    The files a generated suite needs next to its scripts: conftest.py (with the login flow
+    of the first script that had one taken out) and, with page objects, pages.py.
+    """
+    files = {}
+    if SHARED_CONFTEST:
+        login = next((script["login"] for script in scripts or [] if isinstance(script, dict) and script.get("login")), None)
+        files["conftest.py"] = build_conftest(app_context, login)
+    if page_objects:
+        files["pages.py"] = render_page_objects(page_objects, app_context)
+    return files
+
+
+def is_login_story(title: str, description: str = "") -> bool:
+    """True when the story is about authentication itself, so its login steps must stay in the test."""
+    return bool(_LOGIN_STORY.search(f"{title} {description}"))
+
+
+def split_login_steps(steps: List[Dict[str, Any]], base_url: str = "") -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Finds a leading login flow in structured test steps (optional navigate, type username,
+    type password, click submit) followed by further steps. Returns (login, the steps
+    after the login) when there is one, so the test can use the logged_in_driver fixture
+    instead, where login has the flow's URL (resolved against base_url), credentials and
+    selectors for the conftest; otherwise (None, steps), also when a step isn't a dict.
+    """
+    if not all(isinstance(step, dict) for step in steps):
+        return None, steps
+    start = 1 if steps and steps[0].get("action") == "navigate" else 0
+    for position in range(start, min(start + 2, len(steps))):
+        step = steps[position]
+        details = step.get("details")
+        if step.get("action") == "type" and isinstance(details, dict) and _PASSWORD_SELECTOR.search(str(details.get("selector", ""))):
+            # Everything before the password (at most the username) must be typing
+            if any(s.get("action") != "type" for s in steps[start:position]):
+                return None, steps
+            submit = position + 1
+            if submit < len(steps) - 1 and steps[submit].get("action") == "click":
+                username = steps[start]["details"] if position > start and isinstance(steps[start].get("details"), dict) else {}
+                login = {
+                    "url": urljoin(base_url, steps[0]["details"]) if start and isinstance(steps[0].get("details"), str) else "",
+                    "username": str(username.get("text", "")),
+                    "password": str(details.get("text", "")),
+                    "username_selector": str(username.get("selector", "")),
+                    "password_selector": str(details.get("selector", "")),
+                    "submit_selector": steps[submit]["details"] if isinstance(steps[submit].get("details"), str) else "",
+                }
+                return login, steps[submit + 1:]
+            return None, steps
+    return None, steps
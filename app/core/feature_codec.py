@@ -0,0 +1,68 @@
+import os
+import re
+from typing import Any, Dict, List, Tuple
+from app.core.config import PROMPT_SNIPPET_MAX_CHARS, PROMPT_FORM_SNIPPET_MAX_CHARS
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _display_locations(features: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Maps each location to a short display path; absolute paths lose their common prefix."""
+    absolute = sorted({f.get('location', '') for f in features if os.path.isabs(f.get('location', ''))})
+    base = ''
+    if len(absolute) == 1:
+        base = os.path.dirname(absolute[0])
+    elif absolute:
+        base = os.path.commonpath(absolute)
+    display = {}
+    for feature in features:
+        location = feature.get('location', '')
+        if location not in display:
+            shown = os.path.relpath(location, base) if base and os.path.isabs(location) else location
+            display[location] = shown.replace(os.sep, '/')
+    return display
+
+
+def _trim(snippet: str, limit: int = PROMPT_SNIPPET_MAX_CHARS) -> str:
+    snippet = _WHITESPACE.sub(' ', snippet).strip()
+    if len(snippet) > limit:
+        snippet = snippet[:limit - 3] + '...'
+    return snippet
+
+
+def encode_features(features: List[Dict[str, Any]], dedupe: bool = True) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """
+    Renders features compactly for a prompt: grouped under their (relative) file path,
+    one `ID type snippet` line each, with whitespace collapsed and long snippets trimmed.
+    Identical features share one ID unless dedupe is False, in which case feature i gets ID "F<i>".
+    Returns the text and the ID -> feature mapping used to decode model answers.
+    """
+    display = _display_locations(features)
+    mapping: Dict[str, Dict[str, Any]] = {}
+    seen: Dict[Tuple[str, str, str], str] = {}
+    groups: Dict[str, List[str]] = {}
+    for position, feature in enumerate(features):
+        location = display[feature.get('location', '')]
+        limit = PROMPT_FORM_SNIPPET_MAX_CHARS if feature.get('children') else PROMPT_SNIPPET_MAX_CHARS
+        snippet = _trim(str(feature.get('snippet', '')), limit)
+        key = (location, feature.get('type', ''), snippet)
+        if dedupe and key in seen:
+            continue
+        feature_id = f"F{len(mapping) if dedupe else position}"
+        seen[key] = feature_id
+        mapping[feature_id] = feature
+        groups.setdefault(location, []).append(f"{feature_id} {feature.get('type', '')} {snippet}")
+    lines = []
+    for location, rows in groups.items():
+        lines.append(f"# {location}")
+        lines.extend(rows)
+    return "\n".join(lines), mapping
+
+
+def decode_feature(reference: Any, mapping: Dict[str, Dict[str, Any]]) -> Any:
+    """Resolves a feature ID from a model answer back to the full feature object (other values pass through)."""
+    if isinstance(reference, str) and reference.strip() in mapping:
+        return mapping[reference.strip()]
+    if isinstance(reference, dict) and str(reference.get('id', '')) in mapping:
+        return mapping[str(reference['id'])]
+    return reference
@@ -0,0 +1,108 @@
+import hashlib
+import random
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+from app.core.config import FEATURE_DEDUP_THRESHOLD, FEATURE_DEDUP_NUM_PERM, FEATURE_DEDUP_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WHITESPACE = re.compile(r'\s+')
+_DIGITS = re.compile(r'\d+')
+_TOKENS = re.compile(r'\w+|[^\w\s]')
+
+
+def normalize_snippet(snippet: str) -> str:
+    """Lower-cases, collapses whitespace and masks numbers, so `item-1` and `item-2` look alike."""
+    return _DIGITS.sub('0', _WHITESPACE.sub(' ', snippet.lower())).strip()
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    tokens = _TOKENS.findall(text)
+    if len(tokens) <= size:
+        return {' '.join(tokens)}
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class _MinHasher:
+    def __init__(self, num_perm: int, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    def signature(self, shingles: set) -> Tuple[int, ...]:
+        hashes = [_hash64(s) for s in shingles]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self.params)
+
+
+def _similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def cluster_features(features: List[Dict[str, Any]], threshold: float = FEATURE_DEDUP_THRESHOLD) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Collapses equivalent features into one representative per cluster.
+    Features of the same type are equivalent when their normalized snippets are identical
+    or their estimated Jaccard similarity (MinHash over token 3-grams, LSH-bucketed)
+    reaches `threshold`. Each representative is a copy of the cluster's first feature with
+    `occurrences` and `locations` added. Returns the representatives, in input order, and
+    a report of the reduction.
+    """
+    parent = list(range(len(features)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    # Exact duplicates after normalization
+    exact = {}
+    normalized = []
+    for i, feature in enumerate(features):
+        text = normalize_snippet(str(feature.get('snippet', '')))
+        normalized.append(text)
+        key = (feature.get('type', ''), text)
+        if key in exact:
+            union(i, exact[key])
+        else:
+            exact[key] = i
+
+    # Near duplicates among the distinct snippets
+    hasher = _MinHasher(FEATURE_DEDUP_NUM_PERM)
+    rows = FEATURE_DEDUP_NUM_PERM // FEATURE_DEDUP_BANDS
+    signatures = {}
+    buckets = defaultdict(list)
+    for (feature_type, text), i in exact.items():
+        signatures[i] = hasher.signature(_shingles(text))
+        for band in range(FEATURE_DEDUP_BANDS):
+            buckets[(feature_type, band, signatures[i][band * rows:(band + 1) * rows])].append(i)
+    for members in buckets.values():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                if find(i) != find(j) and _similarity(signatures[i], signatures[j]) >= threshold:
+                    union(i, j)
+
+    clusters = defaultdict(list)
+    for i in range(len(features)):
+        clusters[find(i)].append(i)
+    representatives = []
+    for root in sorted(clusters):
+        members = clusters[root]
+        representative = dict(features[root])
+        representative['occurrences'] = len(members)
+        representative['locations'] = list(dict.fromkeys(features[i].get('location', '') for i in members))
+        representatives.append(representative)
+    report = {
+        "features_before": len(features),
+        "features_after": len(representatives),
+        "reduction": round(1 - len(representatives) / len(features), 3) if features else 0.0,
+    }
+    return representatives, report
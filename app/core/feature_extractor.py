@@ -1,50 +1,340 @@
 import os
 import re
-from typing import List, Dict, Any
+import fnmatch
+import multiprocessing
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
+from app.core.config import (
+    FEATURE_EXTRACTION_IGNORE, FEATURE_EXTRACTION_MAX_FILE_BYTES,
+    FEATURE_EXTRACTION_WORKERS, FEATURE_EXTRACTION_PARALLEL_MIN_FILES,
+)
+
+# Bumped whenever extraction output changes, so indexed features get re-extracted.
+EXTRACTOR_VERSION = 2
+
+# One combined pattern per language so each file is scanned in a single pass.
+_JS_PATTERN = re.compile(r'fetch\(["\'][^\)]+["\']\)|axios\.[a-zA-Z]+\(["\'][^\)]+["\']\)')
+_PYTHON_PATTERN = re.compile(
+    r'(?P<route>@[^\n]*\.route\(["\'][^\)]+["\']\))|(?P<function>def [a-zA-Z_][a-zA-Z0-9_]*\()'
+)
+
+SUPPORTED_EXTENSIONS = ('.html', '.js', '.py')
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+_CONTROL_TAGS = ('input', 'select', 'textarea', 'button')
+_TEXT_TAGS = ('button', 'label', 'option')
+_WHITESPACE = re.compile(r'\s+')
 
 def extract_features_from_codebase(base_path: str) -> List[Dict[str, Any]]:
-    features: List[Dict[str, Any]] = []
-    for root, _, files in os.walk(base_path):
+    return list(iter_features_from_codebase(base_path))
+
+def extract_features_from_zip(zip_ref: zipfile.ZipFile) -> List[Dict[str, Any]]:
+    return list(iter_features_from_zip(zip_ref))
+
+def iter_features_from_zip(zip_ref: zipfile.ZipFile, max_workers: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields features straight from the members of a codebase zip, without extracting
+    it to disk. Feature locations are the member paths inside the archive.
+    """
+    for feats in analyze_sources(iter_zip_sources(zip_ref), max_workers=max_workers):
+        yield from feats
+
+def iter_features_from_codebase(base_path: str, max_workers: int = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields features from every supported file under base_path, in walk order.
+    Files are sharded across a process pool once there are enough of them to be
+    worth it; ignored paths (FEATURE_EXTRACTION_IGNORE) and files larger than
+    FEATURE_EXTRACTION_MAX_FILE_BYTES are skipped.
+    """
+    for feats in analyze_files(list(iter_source_files(base_path)), max_workers=max_workers):
+        yield from feats
+
+def _process_pool(workers: int) -> ProcessPoolExecutor:
+    # Spawned, not forked: the server process has threads and open SQLite connections
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def analyze_files(file_paths: List[str], max_workers: int = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yields the feature list of each file in `file_paths`, in order, using a process pool for large batches."""
+    workers = max_workers or FEATURE_EXTRACTION_WORKERS or os.cpu_count() or 1
+    if workers <= 1 or len(file_paths) < FEATURE_EXTRACTION_PARALLEL_MIN_FILES:
+        for file_path in file_paths:
+            yield _analyze_file(file_path)
+        return
+    chunksize = max(1, len(file_paths) // (workers * 4))
+    with _process_pool(workers) as executor:
+        yield from executor.map(_analyze_file, file_paths, chunksize=chunksize)
+
+def analyze_sources(sources: Iterable[Tuple[str, bytes]], max_workers: int = None) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yields the feature list of each (location, content) source, in order. Sources are
+    consumed in windows of FEATURE_EXTRACTION_PARALLEL_MIN_FILES, so only one window
+    of file contents is held in memory; full windows are sharded across a process pool.
+    """
+    workers = max_workers or FEATURE_EXTRACTION_WORKERS or os.cpu_count() or 1
+    executor = None
+    try:
+        window = []
+        for source in sources:
+            window.append(source)
+            if workers > 1 and len(window) >= FEATURE_EXTRACTION_PARALLEL_MIN_FILES:
+                executor = executor or _process_pool(workers)
+                yield from executor.map(_analyze_source, window, chunksize=max(1, len(window) // (workers * 4)))
+                window = []
+        if executor is not None and window:
+            yield from executor.map(_analyze_source, window, chunksize=max(1, len(window) // (workers * 4)))
+        else:
+            for source in window:
+                yield _analyze_source(source)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def iter_zip_sources(zip_ref: zipfile.ZipFile) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yields (member path, content) for supported, non-ignored members within the size cap.
+    Other members are never decompressed.
+    """
+    for info in zip_ref.infolist():
+        if info.is_dir() or not info.filename.endswith(SUPPORTED_EXTENSIONS):
+            continue
+        if any(_is_ignored(part) for part in info.filename.split('/')):
+            continue
+        if info.file_size > FEATURE_EXTRACTION_MAX_FILE_BYTES:
+            continue
+        with zip_ref.open(info) as f:
+            content = f.read(FEATURE_EXTRACTION_MAX_FILE_BYTES + 1)
+        # The size in the member header is not trusted, the read above is bounded either way
+        if len(content) > FEATURE_EXTRACTION_MAX_FILE_BYTES:
+            continue
+        yield info.filename, content
+
+def _is_ignored(name: str) -> bool:
+    return any(fnmatch.fnmatch(name, pattern) for pattern in FEATURE_EXTRACTION_IGNORE)
+
+def iter_source_files(base_path: str) -> Iterator[str]:
+    """Yields the paths of supported, non-ignored files under base_path that are within the size cap."""
+    for root, dirs, files in os.walk(base_path):
+        dirs[:] = [d for d in dirs if not _is_ignored(d)]
         for file in files:
+            if not file.endswith(SUPPORTED_EXTENSIONS) or _is_ignored(file):
+                continue
             file_path = os.path.join(root, file)
-            if file.endswith('.html'):
-                features.extend(_analyze_html(file_path))
-            elif file.endswith('.js'):
-                features.extend(_analyze_js(file_path))
-            elif file.endswith('.py'):
-                features.extend(_analyze_python(file_path))
-    return features
+            try:
+                if os.path.getsize(file_path) > FEATURE_EXTRACTION_MAX_FILE_BYTES:
+                    continue
+            except OSError:
+                continue
+            yield file_path
+
+def _analyze_file(file_path: str) -> List[Dict[str, Any]]:
+    if file_path.endswith('.html'):
+        return _analyze_html(file_path)
+    elif file_path.endswith('.js'):
+        return _analyze_js(file_path)
+    elif file_path.endswith('.py'):
+        return _analyze_python(file_path)
+    return []
+
+def _analyze_source(source: Tuple[str, bytes]) -> List[Dict[str, Any]]:
+    location, content = source
+    return analyze_content(content.decode('utf-8', errors='ignore'), location)
+
+def analyze_content(content: str, location: str) -> List[Dict[str, Any]]:
+    """Extracts features from already-read source text; the extension of `location` picks the language."""
+    if location.endswith('.html'):
+        return _extract_html(content, location)
+    elif location.endswith('.js'):
+        return _extract_js(content, location)
+    elif location.endswith('.py'):
+        return _extract_python(content, location)
+    return []
+
+def _read(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return f.read()
 
 def _analyze_html(file_path: str) -> List[Dict[str, Any]]:
+    return _extract_html(_read(file_path), file_path)
+
+def _analyze_js(file_path: str) -> List[Dict[str, Any]]:
+    return _extract_js(_read(file_path), file_path)
+
+def _analyze_python(file_path: str) -> List[Dict[str, Any]]:
+    return _extract_python(_read(file_path), file_path)
+
+class _HtmlFeatureParser(HTMLParser):
+    """
+    Walks an HTML document and collects its forms (with their controls) and the
+    controls outside any form, each with its attributes, text and DOM path.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack: List[Tuple[str, str]] = []  # (tag, path segment) of the open elements
+        self.forms: List[Dict[str, Any]] = []
+        self.open_forms: List[Dict[str, Any]] = []
+        self.controls: List[Dict[str, Any]] = []
+        self.labels: List[Dict[str, Any]] = []
+        self.text_targets: List[Tuple[str, Dict[str, Any]]] = []
+
+    def _path(self, segment: str) -> str:
+        return ' > '.join([s for tag, s in self.stack if tag not in ('html',)] + [segment])
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value if value is not None else '' for name, value in attrs}
+        segment = tag + (f"#{attrs['id']}" if attrs.get('id') else f".{attrs['class'].split()[0]}" if attrs.get('class', '').split() else '')
+        element = {'type': tag, 'snippet': self.get_starttag_text(), 'attrs': attrs, 'path': self._path(segment),
+                   'order': self.getpos()}
+        if tag == 'form':
+            element['children'] = []
+            self.forms.append(element)
+            self.open_forms.append(element)
+        elif tag in _CONTROL_TAGS and not (tag == 'input' and attrs.get('type', '').lower() == 'hidden'):
+            element['form'] = self.open_forms[-1] if self.open_forms else None
+            self.controls.append(element)
+        elif tag == 'label':
+            element['wrapped'] = None
+            self.labels.append(element)
+        elif tag == 'option':
+            select = next((c for c in reversed(self.controls) if c['type'] == 'select'), None)
+            if select is not None and any(t == 'select' for t, _ in self.stack):
+                select.setdefault('options', []).append(element)
+        if tag in _TEXT_TAGS:
+            element['text'] = ''
+            self.text_targets.append((tag, element))
+        for _, target in self.text_targets:
+            if target['type'] == 'label' and tag in _CONTROL_TAGS and target['wrapped'] is None:
+                target['wrapped'] = element
+        if tag not in _VOID_TAGS:
+            self.stack.append((tag, segment))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        for _, target in self.text_targets:
+            target['text'] += data
+
+    def handle_endtag(self, tag):
+        # Close up to the matching element; stray end tags are ignored
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.stack[depth][0] == tag:
+                closed = [t for t, _ in self.stack[depth:]]
+                del self.stack[depth:]
+                break
+        else:
+            return
+        for closed_tag in closed:
+            if closed_tag == 'form' and self.open_forms:
+                self.open_forms.pop()
+            for position in range(len(self.text_targets) - 1, -1, -1):
+                if self.text_targets[position][0] == closed_tag:
+                    del self.text_targets[position]
+                    break
+
+
+def _clean_text(text: str) -> str:
+    return _WHITESPACE.sub(' ', text or '').strip()
+
+
+def _describe_control(control: Dict[str, Any]) -> str:
+    """A compact, CSS-like description of a form control, e.g. `input[type=password][name=password] "Password"`."""
+    attrs = control['attrs']
+    parts = [control['type'] + (f"#{attrs['id']}" if attrs.get('id') else '')]
+    for name in ('type', 'name'):
+        if attrs.get(name):
+            parts.append(f"[{name}={attrs[name]}]")
+    if 'required' in attrs:
+        parts.append('[required]')
+    label = control.get('label') or control.get('text')
+    if label:
+        parts.append(f' "{label}"')
+    if control.get('options'):
+        parts.append(f" ({len(control['options'])} options)")
+    return ''.join(parts)
+
+
+def _is_submit(control: Dict[str, Any]) -> bool:
+    kind = control['attrs'].get('type', '').lower()
+    return (control['type'] == 'button' and kind in ('', 'submit')) or (control['type'] == 'input' and kind in ('submit', 'image'))
+
+
+def _control_feature(control: Dict[str, Any], location: str) -> Dict[str, Any]:
+    feature = {'type': control['type'], 'location': location, 'snippet': control['snippet'],
+               'attrs': control['attrs'], 'path': control['path']}
+    text = _clean_text(control.get('text'))
+    if text:
+        feature['text'] = text
+        feature['snippet'] += f"{text}</{control['type']}>"
+    if control.get('label'):
+        feature['label'] = control['label']
+    if control.get('options'):
+        feature['options'] = [_clean_text(o.get('text')) or o['attrs'].get('value', '') for o in control['options']]
+    return feature
+
+
+def _extract_html(content: str, location: str) -> List[Dict[str, Any]]:
+    """
+    Parses an HTML document into hierarchical features: one 'form' feature per form with
+    its action, method, controls (each with its label) and submit control, plus one
+    feature per control outside any form, all in document order with their DOM path.
+    A form's snippet is its opening tag followed by a compact description of its controls.
+    """
+    parser = _HtmlFeatureParser()
+    try:
+        parser.feed(content)
+        parser.close()
+    except Exception as e:
+        print(f"[ERROR] Could not parse HTML in {location}: {e}")
+    by_id = {control['attrs']['id']: control for control in parser.controls if control['attrs'].get('id')}
+    for label in parser.labels:
+        target = by_id.get(label['attrs'].get('for')) if label['attrs'].get('for') else label['wrapped']
+        text = _clean_text(label.get('text'))
+        if target is not None and text and not target.get('label'):
+            target['label'] = text
+    forms_by_id = {form['attrs']['id']: form for form in parser.forms if form['attrs'].get('id')}
+    for control in parser.controls:
+        attrs = control['attrs']
+        control['label'] = control.get('label') or attrs.get('placeholder') or attrs.get('aria-label', '')
+        if control['type'] == 'input' and attrs.get('type', '').lower() in ('submit', 'button', 'reset') and not control['label']:
+            control['label'] = attrs.get('value', '')
+        # The form attribute associates a control with a form elsewhere in the document
+        form = forms_by_id.get(control['attrs'].get('form')) or control['form']
+        control['form'] = form
+        if form is not None:
+            form['children'].append(control)
+    # Top-level features in document order: every form (even one whose controls JavaScript
+    # adds later) and the controls outside any form
+    items = sorted(parser.forms + [c for c in parser.controls if c['form'] is None], key=lambda e: e['order'])
     feats = []
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    for match in re.finditer(r'<form[^>]*>', content, re.IGNORECASE):
-        feats.append({'type': 'form', 'location': file_path, 'snippet': match.group(0)})
-    for match in re.finditer(r'<button[^>]*>', content, re.IGNORECASE):
-        feats.append({'type': 'button', 'location': file_path, 'snippet': match.group(0)})
-    for match in re.finditer(r'<input[^>]*>', content, re.IGNORECASE):
-        feats.append({'type': 'input', 'location': file_path, 'snippet': match.group(0)})
+    for item in items:
+        if item['type'] != 'form':
+            feats.append(_control_feature(item, location))
+            continue
+        described = '; '.join(_describe_control(child) for child in item['children'])
+        feats.append({
+            'type': 'form', 'location': location,
+            'snippet': f"{item['snippet']} {described}".strip(),
+            'attrs': item['attrs'], 'path': item['path'],
+            'action': item['attrs'].get('action', ''), 'method': (item['attrs'].get('method') or 'get').lower(),
+            'children': [_control_feature(child, location) for child in item['children']],
+            # Position of the submit control in children, if the form has one
+            'submit': next((position for position, child in enumerate(item['children']) if _is_submit(child)), None),
+        })
     return feats
 
-def _analyze_js(file_path: str) -> List[Dict[str, Any]]:
+def _extract_js(content: str, location: str) -> List[Dict[str, Any]]:
     feats = []
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    for match in re.finditer(r'fetch\(["\"][^\)]+["\"]\)', content):
-        feats.append({'type': 'api_call', 'location': file_path, 'snippet': match.group(0)})
-    for match in re.finditer(r'axios\.([a-zA-Z]+)\(["\"][^\)]+["\"]\)', content):
-        feats.append({'type': 'api_call', 'location': file_path, 'snippet': match.group(0)})
+    for match in _JS_PATTERN.finditer(content):
+        feats.append({'type': 'api_call', 'location': location, 'snippet': match.group(0)})
     return feats
 
-def _analyze_python(file_path: str) -> List[Dict[str, Any]]:
+def _extract_python(content: str, location: str) -> List[Dict[str, Any]]:
     feats = []
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-        content = f.read()
-    for match in re.finditer(r'@app\.route\(["\"][^\)]+["\"]\)', content):
-        feats.append({'type': 'route', 'location': file_path, 'snippet': match.group(0)})
-    for match in re.finditer(r'@.*\.route\(["\"][^\)]+["\"]\)', content):
-        feats.append({'type': 'route', 'location': file_path, 'snippet': match.group(0)})
-    for match in re.finditer(r'def ([a-zA-Z_][a-zA-Z0-9_]*)\(', content):
-        feats.append({'type': 'function', 'location': file_path, 'snippet': match.group(0)})
-    return feats 
\ No newline at end of file
+    for match in _PYTHON_PATTERN.finditer(content):
+        feats.append({'type': 'route' if match.group('route') else 'function', 'location': location, 'snippet': match.group(0)})
+    return feats
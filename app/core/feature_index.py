@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zipfile
+from collections import Counter
+from typing import Any, Dict, List, Tuple, Union
+from app.core.config import FEATURE_INDEX_PATH
+from app.core.feature_extractor import (
+    EXTRACTOR_VERSION, extract_features_from_codebase, extract_features_from_zip,
+    iter_source_files, iter_zip_sources, analyze_sources,
+)
+
+
+def _feature_key(feature: Dict[str, Any]) -> Tuple[str, str, str]:
+    return (feature.get('type', ''), feature.get('location', ''), feature.get('snippet', ''))
+
+
+def feature_key(feature: Dict[str, Any]) -> str:
+    """A stable key for a feature (SHA-256 of its type, location and snippet)."""
+    return hashlib.sha256(json.dumps(_feature_key(feature)).encode('utf-8')).hexdigest()
+
+
+def diff_features(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Returns the features added and removed between two feature lists (compared by type, location and snippet)."""
+    common = Counter(_feature_key(f) for f in old) & Counter(_feature_key(f) for f in new)
+
+    def _unmatched(features):
+        remaining = Counter(common)
+        result = []
+        for feature in features:
+            key = _feature_key(feature)
+            if remaining[key] > 0:
+                remaining[key] -= 1
+            else:
+                result.append(feature)
+        return result
+
+    return {"added": _unmatched(new), "removed": _unmatched(old)}
+
+
+class FeatureIndex:
+    """
+    Persistent per-project index of extracted features, keyed by each file's path
+    relative to the project root and the SHA-256 of its content (tagged with the extractor
+    version). Re-analysing a project only runs the extractors over files that are new or
+    have changed. The stories generated for a project's features are kept too, so
+    unchanged features can reuse them.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "project_id TEXT NOT NULL, path TEXT NOT NULL, content_hash TEXT NOT NULL, features TEXT NOT NULL, "
+            "PRIMARY KEY (project_id, path))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stories ("
+            "project_id TEXT NOT NULL, feature_key TEXT NOT NULL, story TEXT NOT NULL, "
+            "PRIMARY KEY (project_id, feature_key))"
+        )
+        self._conn.commit()
+
+    def stories(self, project_id: str) -> Dict[str, Dict[str, Any]]:
+        """The stored feature stories of a project, by feature_key."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT feature_key, story FROM stories WHERE project_id = ?", (project_id,)
+            ).fetchall()
+        return {key: json.loads(story) for key, story in rows}
+
+    def put_story(self, project_id: str, feature: Dict[str, Any], story: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stories (project_id, feature_key, story) VALUES (?, ?, ?)",
+                (project_id, feature_key(feature), json.dumps(story)),
+            )
+            self._conn.commit()
+
+    def update(self, project_id: str, source: Union[str, zipfile.ZipFile]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Brings the project's index in line with `source`, a codebase directory or zip.
+        Returns the project's full feature list, with locations relative to the project
+        root, and a diff against the previous upload: the added and removed features, the
+        changed and removed file paths and the number of unchanged files.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, content_hash, features FROM files WHERE project_id = ?", (project_id,)
+            ).fetchall()
+        indexed = {path: (content_hash, json.loads(features)) for path, content_hash, features in rows}
+
+        if isinstance(source, zipfile.ZipFile):
+            sources = iter_zip_sources(source)
+        else:
+            sources = _iter_dir_sources(source)
+        current = {}
+        changed = []
+
+        def _changed_sources():
+            # Hash every file, but only hand new or modified ones on to the extractors
+            for rel_path, content in sources:
+                # The extractor version is part of the hash, so a new extractor re-analyses every file
+                content_hash = f"v{EXTRACTOR_VERSION}:{hashlib.sha256(content).hexdigest()}"
+                current[rel_path] = content_hash
+                if rel_path not in indexed or indexed[rel_path][0] != content_hash:
+                    changed.append(rel_path)
+                    yield rel_path, content
+
+        fresh = {}
+        for position, feats in enumerate(analyze_sources(_changed_sources())):
+            fresh[changed[position]] = feats
+        removed_files = [rel for rel in indexed if rel not in current]
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files (project_id, path, content_hash, features) VALUES (?, ?, ?, ?)",
+                [(project_id, rel, current[rel], json.dumps(fresh[rel])) for rel in changed],
+            )
+            self._conn.executemany(
+                "DELETE FROM files WHERE project_id = ? AND path = ?",
+                [(project_id, rel) for rel in removed_files],
+            )
+            self._conn.commit()
+
+        old_features, new_features = [], []
+        for rel in changed:
+            old_features.extend(indexed[rel][1] if rel in indexed else [])
+            new_features.extend(fresh[rel])
+        for rel in removed_files:
+            old_features.extend(indexed[rel][1])
+
+        features = []
+        for rel in current:
+            features.extend(fresh[rel] if rel in fresh else indexed[rel][1])
+
+        diff = diff_features(old_features, new_features)
+        diff.update({
+            "changed_files": changed,
+            "removed_files": removed_files,
+            "unchanged_files": len(current) - len(changed),
+        })
+        return features, diff
+
+
+def _iter_dir_sources(base_path: str):
+    for file_path in iter_source_files(base_path):
+        with open(file_path, 'rb') as f:
+            yield os.path.relpath(file_path, base_path).replace(os.sep, '/'), f.read()
+
+
+def extract_features(source: Union[str, zipfile.ZipFile], project_id: str = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Extracts features from `source`, a codebase directory or an open zip. With a project_id
+    the extraction is incremental and also returns the diff against the previous upload of
+    that project (otherwise None).
+    """
+    if not project_id:
+        if isinstance(source, zipfile.ZipFile):
+            return extract_features_from_zip(source), None
+        return extract_features_from_codebase(source), None
+    return get_feature_index().update(project_id, source)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_feature_index() -> FeatureIndex:
+    """Returns the process-wide feature index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FeatureIndex(FEATURE_INDEX_PATH)
+        return _index
@@ -0,0 +1,95 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Tuple
+from app.core.config import FEATURE_MATCH_MIN_TERMS, FEATURE_MATCH_MIN_MARGIN
+
+# Acronyms (HTML, API), capitalized or lower-case words and numbers; HTMLParser -> HTML, Parser
+_TOKEN_PATTERN = re.compile(r'[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+')
+_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'i', 'in', 'is', 'it',
+    'of', 'on', 'or', 'should', 'so', 'that', 'the', 'to', 'user', 'users', 'want', 'with',
+    'can', 'able', 'will', 'must', 'when', 'their', 'my', 'we', 'you',
+}
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens of at least two characters; camelCase and snake_case
+    identifiers are split into words and acronyms are kept whole.
+    """
+    tokens = (t.lower() for t in _TOKEN_PATTERN.findall(text))
+    return [t for t in tokens if len(t) > 1 and t not in _STOPWORDS]
+
+def feature_text(feature: Dict[str, Any]) -> str:
+    """The text a feature is ranked on: its type, file name and snippet."""
+    location = feature.get('location', '')
+    return f"{feature.get('type', '')} {os.path.basename(location)} {feature.get('snippet', '')}"
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of documents, backed by an inverted index."""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(documents)
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.lengths) / self.size) if self.size else 0.0
+        self.postings = defaultdict(list)
+        for doc_id, doc in enumerate(documents):
+            for term, tf in Counter(doc).items():
+                self.postings[term].append((doc_id, tf))
+        self.idf = {
+            term: math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def scores(self, query: List[str]) -> Dict[int, Tuple[float, float]]:
+        """
+        Returns {doc_id: (bm25 score, coverage)} for documents sharing a term with the query.
+        Coverage is the share of the query's IDF weight found in the document (0-1).
+        """
+        terms = set(query)
+        # Terms missing from every document weigh as much as the rarest possible term
+        unseen_idf = math.log(1 + (self.size + 0.5) / 0.5)
+        total_idf = sum(self.idf.get(term, unseen_idf) for term in terms)
+        bm25 = defaultdict(float)
+        covered = defaultdict(float)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = 1 - self.b + self.b * (self.lengths[doc_id] / self.avg_length if self.avg_length else 0)
+                bm25[doc_id] += idf * tf * (self.k1 + 1) / (tf + self.k1 * norm)
+                covered[doc_id] += idf
+        return {
+            doc_id: (score, covered[doc_id] / total_idf if total_idf else 0.0)
+            for doc_id, score in bm25.items()
+        }
+
+
+def rank_features(requirements: List[str], features: List[Dict[str, Any]], top_k: int) -> List[List[Tuple[int, float]]]:
+    """
+    Scores every requirement against every feature locally (no network) and returns,
+    per requirement, up to top_k (feature index, confidence) pairs, best first.
+    Confidence is the share of the requirement's distinctive terms the feature contains,
+    scaled down for requirements with fewer than FEATURE_MATCH_MIN_TERMS distinctive
+    terms and for features whose BM25 score doesn't lead every other candidate by
+    FEATURE_MATCH_MIN_MARGIN, so only specific requirements with a clear winner score 1.
+    """
+    index = BM25Index([tokenize(feature_text(feature)) for feature in features])
+    shortlist = []
+    for requirement in requirements:
+        terms = tokenize(requirement)
+        term_factor = min(1.0, len(set(terms)) / FEATURE_MATCH_MIN_TERMS) if FEATURE_MATCH_MIN_TERMS else 1.0
+        scored = sorted(index.scores(terms).items(), key=lambda item: item[1][0], reverse=True)
+        ranked = []
+        for position, (doc_id, (score, coverage)) in enumerate(scored[:top_k]):
+            # The best other candidate: the runner-up for the leader, the leader for everyone else
+            other = scored[1][1][0] if position == 0 and len(scored) > 1 else scored[0][1][0] if position else 0.0
+            lead_factor = 1.0 if other <= 0 else min(1.0, (score / other) / (1 + FEATURE_MATCH_MIN_MARGIN))
+            ranked.append((doc_id, coverage * term_factor * lead_factor))
+        shortlist.append(ranked)
+    return shortlist
@@ -0,0 +1,291 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from app.core.config import JOBS_DB_PATH, JOBS_DIR, JOB_MAX_WORKERS, PAGE_OBJECTS_ENABLED
+from app.core.feature_index import extract_features
+from app.core.page_objects import build_page_objects
+from app.core.selenium_gen import iter_selenium_scripts
+from app.core.user_story import iter_comprehensive_test_plan, assemble_test_plan
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    SQLite persistence for background jobs. Each job keeps its parameters, per-stage
+    progress and the partial results (items) produced so far, so finished work
+    survives a restart.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, params TEXT NOT NULL, "
+            "progress TEXT NOT NULL, error TEXT, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            "job_id TEXT NOT NULL, item_id TEXT NOT NULL, position INTEGER NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (job_id, item_id))"
+        )
+        self._conn.commit()
+
+    def create(self, kind: str, params: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, params, progress, error, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(params), json.dumps({}), now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, params, progress, error, created, updated FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "kind": row[1],
+            "status": row[2],
+            "params": json.loads(row[3]),
+            "progress": json.loads(row[4]),
+            "error": row[5],
+            "created": row[6],
+            "updated": row[7],
+        }
+
+    def update(self, job_id: str, status: Optional[str] = None, progress: Optional[dict] = None,
+               error: Optional[str] = None) -> None:
+        fields = ["updated = ?", "error = ?"]
+        values = [time.time(), error]
+        if status is not None:
+            fields.append("status = ?")
+            values.append(status)
+        if progress is not None:
+            fields.append("progress = ?")
+            values.append(json.dumps(progress))
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?", (*values, job_id))
+            self._conn.commit()
+
+    def ids_with_status(self, *statuses: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(statuses))}) ORDER BY created",
+                statuses,
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def put_item(self, job_id: str, item_id: str, value, replace: bool = True) -> None:
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        with self._lock:
+            position = self._conn.execute(
+                "SELECT COALESCE((SELECT position FROM job_items WHERE job_id = ? AND item_id = ?), "
+                "(SELECT COUNT(*) FROM job_items WHERE job_id = ?))",
+                (job_id, item_id, job_id),
+            ).fetchone()[0]
+            self._conn.execute(
+                f"{verb} INTO job_items (job_id, item_id, position, value) VALUES (?, ?, ?, ?)",
+                (job_id, item_id, position, json.dumps(value)),
+            )
+            self._conn.commit()
+
+    def items(self, job_id: str, prefix: str = "") -> list:
+        """Returns (item_id, value) pairs for a job in insertion order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, value FROM job_items WHERE job_id = ? AND item_id LIKE ? ORDER BY position",
+                (job_id, prefix + "%"),
+            ).fetchall()
+        return [(item_id, json.loads(value)) for item_id, value in rows]
+
+
+def job_dir(job_id: str) -> str:
+    """Directory holding a job's input files (e.g. the uploaded codebase)."""
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _run_test_plan_job(store: JobStore, job: dict) -> None:
+    params = job["params"]
+    job_id = job["id"]
+    progress = job["progress"]
+    features_item = store.items(job_id, "features")
+    feature_diff = None
+    if features_item:
+        features = features_item[0][1]
+        diff_item = store.items(job_id, "feature_diff")
+        feature_diff = diff_item[0][1] if diff_item else None
+    else:
+        progress["extraction"] = {"status": "started"}
+        store.update(job_id, progress=progress)
+        with zipfile.ZipFile(os.path.join(job_dir(job_id), "codebase.zip"), "r") as zip_ref:
+            features, feature_diff = extract_features(zip_ref, params.get("project_id"))
+        store.put_item(job_id, "features", features)
+        if feature_diff is not None:
+            store.put_item(job_id, "feature_diff", feature_diff)
+    progress["extraction"] = {"status": "completed", "features": len(features)}
+    store.update(job_id, progress=progress)
+
+    done = {int(item_id.split(":", 1)[1]) for item_id, _ in store.items(job_id, "story:")}
+    # A resumed job continues from the stored feature plan (matches, backlog and the
+    # unmatched feature list), so stored story indices keep pointing at the same features.
+    plan_item = store.items(job_id, "feature_plan")
+    for event in iter_comprehensive_test_plan(
+        requirements=params["requirements"],
+        features=features,
+        model_id=params["model_id"],
+        app_context=params["app_context"],
+        use_cache=params.get("use_cache", True),
+        skip_feature_indices=done,
+        feature_plan=plan_item[0][1] if plan_item else None,
+        on_feature_plan=lambda plan: store.put_item(job_id, "feature_plan", plan),
+        project_id=params.get("project_id"),
+        feature_diff=feature_diff,
+    ):
+        if event["event"] == "progress":
+            progress[event["stage"]] = {k: v for k, v in event.items() if k not in ("event", "stage")}
+            store.update(job_id, progress=progress)
+        elif event["event"] == "epic":
+            store.put_item(job_id, f"epic:{event['epic'].get('epic')}", event, replace=False)
+        elif event["event"] == "story":
+            store.put_item(job_id, f"story:{event['index']}", event)
+        elif event["event"] == "metadata":
+            store.put_item(job_id, "metadata", event)
+
+
+def _run_scripts_job(store: JobStore, job: dict) -> None:
+    params = job["params"]
+    job_id = job["id"]
+    progress = job["progress"]
+    user_stories = params["user_stories"]
+    done = {int(item_id.split(":", 1)[1]) for item_id, _ in store.items(job_id, "script:")}
+    pending = [index for index in range(len(user_stories)) if index not in done]
+    completed = len(done)
+    progress["scripts"] = {"status": "running", "completed": completed, "total": len(user_stories)}
+    store.update(job_id, progress=progress)
+    features = params.get("features")
+    page_objects = None
+    if PAGE_OBJECTS_ENABLED and features:
+        page_objects = build_page_objects(features, params.get("app_context") or {})
+    for position, script in iter_selenium_scripts(
+        [user_stories[index] for index in pending],
+        params["model_id"],
+        use_cache=params.get("use_cache", True),
+        page_objects=page_objects,
+    ):
+        store.put_item(job_id, f"script:{pending[position]}", script)
+        completed += 1
+        progress["scripts"]["completed"] = completed
+        statuses = progress["scripts"].setdefault("statuses", {})
+        statuses[script.get("status", "unknown")] = statuses.get(script.get("status", "unknown"), 0) + 1
+        store.update(job_id, progress=progress)
+    progress["scripts"]["status"] = "completed"
+    store.update(job_id, progress=progress)
+
+
+JOB_RUNNERS = {
+    "test_plan": _run_test_plan_job,
+    "scripts": _run_scripts_job,
+}
+
+
+class JobManager:
+    """Runs jobs on a bounded worker pool and records their state in a JobStore."""
+
+    def __init__(self, store: JobStore, max_workers: int = JOB_MAX_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self._active = set()
+        self._active_lock = threading.Lock()
+
+    def submit(self, kind: str, params: dict) -> str:
+        if kind not in JOB_RUNNERS:
+            raise ValueError(f"Unsupported job kind: {kind}")
+        job_id = self.store.create(kind, params)
+        self.resume(job_id)
+        return job_id
+
+    def resume(self, job_id: str) -> bool:
+        """
+        Queues a new, failed or interrupted job; work already stored is kept and skipped.
+        Returns False if the job is unknown, completed or already queued in this process.
+        """
+        job = self.store.get(job_id)
+        if job is None or job["status"] == COMPLETED:
+            return False
+        with self._active_lock:
+            if job_id in self._active:
+                return False
+            self._active.add(job_id)
+        self.store.update(job_id, status=QUEUED)
+        self._executor.submit(self._run, job_id)
+        return True
+
+    def resume_interrupted(self) -> None:
+        """Re-queues jobs that were queued or running when the process stopped."""
+        for job_id in self.store.ids_with_status(QUEUED, RUNNING):
+            self.resume(job_id)
+
+    def _run(self, job_id: str) -> None:
+        try:
+            job = self.store.get(job_id)
+            self.store.update(job_id, status=RUNNING)
+            JOB_RUNNERS[job["kind"]](self.store, job)
+            self.store.update(job_id, status=COMPLETED)
+        except Exception as e:
+            print(f"[ERROR] Job {job_id} failed: {e}")
+            self.store.update(job_id, status=FAILED, error=str(e))
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+
+    def result(self, job_id: str):
+        """Returns the job's output so far: the (partial) test plan or the list of scripts."""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job["kind"] == "test_plan":
+            items = dict(self.store.items(job_id))
+            plan = assemble_test_plan(
+                value for item_id, value in items.items() if item_id not in ("features", "feature_diff", "feature_plan")
+            )
+            if "feature_diff" in items:
+                plan["feature_diff"] = items["feature_diff"]
+            return plan
+        return [value for _, value in sorted(
+            self.store.items(job_id, "script:"), key=lambda item: int(item[0].split(":", 1)[1])
+        )]
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Returns the process-wide job manager."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(JobStore(JOBS_DB_PATH))
+        return _manager
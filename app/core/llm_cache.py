@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+def make_cache_key(provider: str, model: str, temperature: float, output_format: Optional[str], prompt: str) -> str:
+    """Builds a content-addressed key from everything that determines an LLM response."""
+    payload = json.dumps(
+        {
+            "provider": provider,
+            "model": model,
+            "temperature": temperature,
+            "format": output_format,
+            "prompt": prompt,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed store for LLM responses.
+    Entries expire after `ttl` seconds (None = never). Once `max_entries` or `max_bytes`
+    is exceeded, the least recently used entries are evicted in one batch down to
+    `low_water` of the limits, so eviction doesn't run on every insert. Entry count and
+    size are tracked in memory rather than recounted per insert.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, low_water: float = 0.9):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_created ON entries (created)")
+        self._conn.commit()
+        self._count, self._bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created, size FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                self._bytes -= row[2]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            if old is None:
+                self._count += 1
+            else:
+                self._bytes -= old[0]
+            self._bytes += size
+            self._evict()
+            self._conn.commit()
+
+    def _over(self, entries: Optional[float], size: Optional[float]) -> bool:
+        return (entries is not None and self._count > entries) or (size is not None and self._bytes > size)
+
+    def _evict(self) -> None:
+        if not self._over(self.max_entries, self.max_bytes):
+            return
+        if self.ttl is not None:
+            # Expired entries go first; the created index keeps this a range scan
+            cutoff = time.time() - self.ttl
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE created < ?", (cutoff,)
+            ).fetchone()
+            if count:
+                self._conn.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+                self._count -= count
+                self._bytes -= total
+        target_entries = int(self.max_entries * self.low_water) if self.max_entries is not None else None
+        target_bytes = int(self.max_bytes * self.low_water) if self.max_bytes is not None else None
+        while self._count > 0 and self._over(target_entries, target_bytes):
+            # One batch of least recently used entries per round, sized by the entry overshoot
+            batch = max(100, self._count - target_entries if target_entries is not None else 0)
+            rows = self._conn.execute("SELECT key, size FROM entries ORDER BY accessed LIMIT ?", (batch,)).fetchall()
+            stale = []
+            for key, size in rows:
+                if not self._over(target_entries, target_bytes):
+                    break
+                stale.append((key,))
+                self._count -= 1
+                self._bytes -= size
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+            self._count, self._bytes = 0, 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._count, self._bytes
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": count,
+            "size_bytes": total,
+        }
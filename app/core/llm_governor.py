@@ -0,0 +1,187 @@
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Optional
+
+RETRYABLE_STATUS_CODES = {408, 409, 500, 502, 503, 504, 529}
+THROTTLE_STATUS_CODES = {429, 529}
+FATAL, RETRYABLE, THROTTLED = "fatal", "retryable", "throttled"
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Blocks until `amount` units are available; requests larger than the bucket wait for a full one."""
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait_for = (amount - self.tokens) / self.rate
+            time.sleep(wait_for)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts AIMD-style: every success raises the limit by
+    1/limit (about +1 per round of requests), a throttling response halves it.
+    Halvings are spaced by `cooldown` seconds so one burst of 429s counts once.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, cooldown: float = 5.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.limit = float(self.max_limit)
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self) -> None:
+        with self._cond:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    for candidate in (error, getattr(error, "response", None)):
+        code = getattr(candidate, "status_code", None) or getattr(candidate, "status", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """The delay in seconds a Retry-After header on the error's response asks for, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error: Exception) -> str:
+    """
+    Sorts a failed LLM call into THROTTLED (rate limited or overloaded: retry and back
+    off), RETRYABLE (transient network or server error: retry) or FATAL (bad request,
+    auth, unparseable output: do not retry).
+    """
+    code = _status_code(error)
+    if code is not None:
+        if code in THROTTLE_STATUS_CODES:
+            return THROTTLED
+        return RETRYABLE if code in RETRYABLE_STATUS_CODES else FATAL
+    name = type(error).__name__.lower()
+    if "ratelimit" in name or "overloaded" in name:
+        return THROTTLED
+    if isinstance(error, (ConnectionError, TimeoutError)) or "timeout" in name or "connect" in name:
+        return RETRYABLE
+    return FATAL
+
+
+class ProviderGovernor:
+    """
+    Gates every request to one provider: requests-per-minute and tokens-per-minute
+    token buckets, an adaptive concurrency limit, and retries of throttled or
+    transient failures with exponential backoff and full jitter.
+    """
+
+    def __init__(self, provider: str, max_concurrency: int, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0):
+        self.provider = provider
+        self.limiter = AdaptiveLimiter(max_concurrency)
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def backoff(self, attempt: int, error: Exception = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        hinted = retry_after(error) if error is not None else None
+        return max(delay, hinted) if hinted is not None else delay
+
+    def call(self, func: Callable[[], Any], tokens: int = 0) -> Any:
+        """Runs func under the provider's limits, retrying retryable failures; re-raises the last error."""
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                if self.requests is not None:
+                    self.requests.acquire(1)
+                if self.tokens is not None and tokens:
+                    self.tokens.acquire(tokens)
+                result = func()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == THROTTLED:
+                    self.limiter.on_throttle()
+                if kind == FATAL or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt, e)
+                print(f"[DEBUG] {self.provider} request {kind} ({type(e).__name__}: {e}); "
+                      f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s, concurrency limit {int(self.limiter.limit)}")
+            else:
+                self.limiter.on_success()
+                return result
+            finally:
+                self.limiter.release()
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        return {"concurrency_limit": int(self.limiter.limit), "in_flight": self.limiter.in_flight}
+
+
+class LatencyTracker:
+    """Rolling window of request latencies per key, used to pick hedging delays."""
+
+    def __init__(self, window: int = 100, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, key: Any, seconds: float) -> None:
+        with self._lock:
+            self._samples[key].append(seconds)
+
+    def percentile(self, key: Any, fraction: float = 0.95) -> Optional[float]:
+        """The latency below which `fraction` of the recent requests finished, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[int(fraction * (len(samples) - 1))]
@@ -1,19 +1,316 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from langchain_ollama import OllamaLLM
 from langchain_anthropic import ChatAnthropic
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from app.core.config import (
+    AVAILABLE_MODELS, LLM_MAX_CONCURRENCY, DEFAULT_LLM_MAX_CONCURRENCY,
+    MODEL_CONTEXT_TOKENS, DEFAULT_MODEL_CONTEXT_TOKENS, LLM_PROMPT_CONTEXT_FRACTION, LLM_PROMPT_TOKEN_BUDGET,
+    LLM_CACHE_ENABLED, LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES, LLM_CACHE_LOW_WATER,
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+    OLLAMA_ENDPOINTS, OLLAMA_KEEP_ALIVE, OLLAMA_HEALTH_CHECK_INTERVAL,
+    LLM_STAGES, LLM_ROUTE_TIMEOUT, LLM_HEDGE_WINDOW, LLM_HEDGE_MIN_SAMPLES,
+)
+from app.core.llm_cache import LLMCache, make_cache_key
+from app.core.llm_governor import ProviderGovernor, LatencyTracker
+from app.core.ollama_pool import OllamaPool
 
 DEFAULT_OLLAMA_MODEL = 'llama3.2'
 DEFAULT_CLAUDE_MODEL = 'claude-sonnet-4-20250514'
+DEFAULT_TEMPERATURE = 0.2
 
-def get_llm(provider, model_name=None, output_format=None):
+_clients = {}
+_clients_lock = threading.Lock()
+
+_cache = None
+_cache_lock = threading.Lock()
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+_ollama_pool = None
+_ollama_pool_lock = threading.Lock()
+
+_latencies = LatencyTracker(window=LLM_HEDGE_WINDOW, min_samples=LLM_HEDGE_MIN_SAMPLES)
+# Runs routed requests so they can time out, fall back and be hedged
+_route_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-route")
+
+def _is_ollama(provider):
+    return provider == 'ollama' or provider == 'ollama-llama3'
+
+def _build_llm(provider, model_name=None, output_format=None, temperature=DEFAULT_TEMPERATURE, base_url=None):
     if provider == 'claude':
         model = model_name or DEFAULT_CLAUDE_MODEL
-        return ChatAnthropic(model=model, temperature=0.2)
-    elif provider == 'ollama' or provider == 'ollama-llama3':
+        # Retries are handled by the provider governor
+        return ChatAnthropic(model=model, temperature=temperature, max_retries=0)
+    elif _is_ollama(provider):
         model = model_name or DEFAULT_OLLAMA_MODEL
+        options = {"base_url": base_url or OLLAMA_ENDPOINTS[0], "keep_alive": OLLAMA_KEEP_ALIVE}
         if output_format == 'json':
-            return OllamaLLM(model=model, temperature=0.2, format="json")
-        return OllamaLLM(model=model, temperature=0.2)
+            return OllamaLLM(model=model, temperature=temperature, format="json", **options)
+        return OllamaLLM(model=model, temperature=temperature, **options)
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}") 
+
+def get_llm(provider, model_name=None, output_format=None, temperature=DEFAULT_TEMPERATURE, base_url=None):
+    """
+    Returns a shared client for (provider, model, output format, temperature, base URL).
+    Clients are built once per process and reused, so their underlying HTTP
+    connection pools stay warm across calls, threads and event loops.
+    """
+    key = (provider, resolve_model_name(provider, model_name), output_format, temperature, base_url)
+    llm = _clients.get(key)
+    if llm is None:
+        with _clients_lock:
+            llm = _clients.get(key)
+            if llm is None:
+                llm = _build_llm(provider, model_name=key[1], output_format=output_format,
+                                 temperature=temperature, base_url=base_url)
+                _clients[key] = llm
+    return llm
+
+def warm_up_llm_clients():
+    """
+    Builds the clients for every available model so the first request does not pay
+    for it, and preloads Ollama models on every endpoint in the background.
+    """
+    preloaded = set()
+    for model in AVAILABLE_MODELS:
+        if 'stages' in model:
+            continue
+        base_urls = OLLAMA_ENDPOINTS if _is_ollama(model['id']) else [None]
+        for output_format in (None, 'json'):
+            for base_url in base_urls:
+                try:
+                    get_llm(model['id'], output_format=output_format, base_url=base_url)
+                except Exception as e:
+                    print(f"[ERROR] Could not initialise LLM client for '{model['id']}': {e}")
+        if _is_ollama(model['id']):
+            model_name = resolve_model_name(model['id'])
+            if model_name not in preloaded:
+                preloaded.add(model_name)
+                get_ollama_pool().preload(model_name)
+
+def get_ollama_pool():
+    """Returns the process-wide pool of Ollama endpoints (see OLLAMA_ENDPOINTS)."""
+    global _ollama_pool
+    with _ollama_pool_lock:
+        if _ollama_pool is None:
+            _ollama_pool = OllamaPool(
+                OLLAMA_ENDPOINTS,
+                keep_alive=OLLAMA_KEEP_ALIVE,
+                health_interval=OLLAMA_HEALTH_CHECK_INTERVAL,
+            )
+        return _ollama_pool
+
+def get_routing_profile(model_id):
+    """Returns the stage routes of a routing profile in AVAILABLE_MODELS, or None for a plain model."""
+    for model in AVAILABLE_MODELS:
+        if model['id'] == model_id:
+            return model.get('stages')
+    return None
+
+def _profile_models(stages):
+    models = []
+    for route in stages.values():
+        models.extend(m for m in (route.get('model'), route.get('fallback')) if m and m not in models)
+    return models
+
+def validate_routing_profile(stages):
+    """Raises ValueError unless every route names a known stage and plain (non-profile) models."""
+    if not stages:
+        raise ValueError("A routing profile needs at least one stage route.")
+    plain = {model['id'] for model in AVAILABLE_MODELS if 'stages' not in model}
+    for stage, route in stages.items():
+        if stage not in LLM_STAGES:
+            raise ValueError(f"Unknown stage '{stage}'; expected one of {', '.join(LLM_STAGES)}.")
+        for field in ('model', 'fallback'):
+            if (field == 'model' or route.get(field)) and route.get(field) not in plain:
+                raise ValueError(f"Stage '{stage}' {field} '{route.get(field)}' is not an available model.")
+
+def get_max_concurrency(provider):
+    """
+    Returns the configured max in-flight request limit for a provider; for Ollama
+    the per-endpoint limit is multiplied by the number of endpoints. A routing
+    profile gets the highest limit of the models it routes to.
+    """
+    stages = get_routing_profile(provider)
+    if stages:
+        return max(get_max_concurrency(model) for model in _profile_models(stages))
+    limit = LLM_MAX_CONCURRENCY.get(provider, DEFAULT_LLM_MAX_CONCURRENCY)
+    return limit * len(OLLAMA_ENDPOINTS) if _is_ollama(provider) else limit
+
+def get_governor(provider):
+    """
+    Returns the process-wide request governor for a provider: rate limits from
+    LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE, adaptive concurrency up to the
+    provider's in-flight limit, and retries with backoff.
+    """
+    with _governors_lock:
+        governor = _governors.get(provider)
+        if governor is None:
+            governor = ProviderGovernor(
+                provider,
+                max_concurrency=get_max_concurrency(provider),
+                requests_per_minute=LLM_REQUESTS_PER_MINUTE.get(provider),
+                tokens_per_minute=LLM_TOKENS_PER_MINUTE.get(provider),
+                max_retries=LLM_MAX_RETRIES,
+                backoff_base=LLM_BACKOFF_BASE,
+                backoff_max=LLM_BACKOFF_MAX,
+            )
+            _governors[provider] = governor
+        return governor
+
+def estimate_tokens(text):
+    """Rough token count for budgeting prompts (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+def get_prompt_token_budget(provider):
+    """
+    Returns the number of prompt tokens a single request to the provider may use for
+    variable content: a share of the model's context window, capped by
+    LLM_PROMPT_TOKEN_BUDGET when that is set. A routing profile gets the smallest
+    budget of the models it routes to.
+    """
+    stages = get_routing_profile(provider)
+    if stages:
+        return min(get_prompt_token_budget(model) for model in _profile_models(stages))
+    budget = int(MODEL_CONTEXT_TOKENS.get(provider, DEFAULT_MODEL_CONTEXT_TOKENS) * LLM_PROMPT_CONTEXT_FRACTION)
+    if LLM_PROMPT_TOKEN_BUDGET:
+        budget = min(budget, LLM_PROMPT_TOKEN_BUDGET)
+    return budget
+
+def resolve_model_name(provider, model_name=None):
+    """Returns the concrete model name get_llm would use for a provider."""
+    if model_name:
+        return model_name
+    if provider == 'claude':
+        return DEFAULT_CLAUDE_MODEL
+    if _is_ollama(provider):
+        return DEFAULT_OLLAMA_MODEL
+    raise ValueError(f"Unsupported LLM provider: {provider}")
+
+def get_llm_cache():
+    """Returns the process-wide LLM response cache, or None when caching is disabled."""
+    global _cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                LLM_CACHE_PATH,
+                ttl=LLM_CACHE_TTL,
+                max_entries=LLM_CACHE_MAX_ENTRIES,
+                max_bytes=LLM_CACHE_MAX_BYTES,
+                low_water=LLM_CACHE_LOW_WATER,
+            )
+        return _cache
+
+def parse_json_response(response):
+    """Strips Markdown code fences from an LLM response and parses it as JSON."""
+    cleaned_response = response.strip()
+    if cleaned_response.startswith('```json'):
+        cleaned_response = cleaned_response[7:]
+    elif cleaned_response.startswith('```'):
+        cleaned_response = cleaned_response[3:]
+    if cleaned_response.endswith('```'):
+        cleaned_response = cleaned_response[:-3]
+    return json.loads(cleaned_response.strip())
+
+def invoke_llm(prompt, variables, provider, model_name=None, output_format=None,
+               temperature=DEFAULT_TEMPERATURE, parse=None, use_cache=True, stage=None):
+    """
+    Renders `prompt` with `variables` and sends it to the provider's model.
+    Responses are cached by provider, model, temperature, output format and the
+    rendered prompt; pass use_cache=False to bypass the cache for a request.
+    When `parse` is given, its result is returned and the response is only
+    cached if parsing succeeds, so malformed output is never replayed.
+    Requests go through the provider's governor, which rate limits them and
+    retries throttled or transient failures; fatal errors are raised at once.
+    Ollama requests are balanced across the endpoint pool.
+    `provider` may also be a routing profile, in which case `stage` (one of
+    LLM_STAGES) picks the model, its fallback and whether to hedge.
+    """
+    rendered = prompt.format(**variables)
+    stages = get_routing_profile(provider)
+    if not stages:
+        return _invoke_model(rendered, provider, model_name, output_format, temperature, parse, use_cache, stage)
+    route = stages.get(stage) or next(iter(stages.values()))
+    models = [route['model']] + ([route['fallback']] if route.get('fallback') else [])
+    error = None
+    for position, model in enumerate(models):
+        last = position == len(models) - 1
+        try:
+            return _call_with_hedge(
+                lambda model=model: _invoke_model(rendered, model, None, output_format, temperature, parse, use_cache, stage),
+                (model, stage),
+                hedge=route.get('hedge', False),
+                # The last candidate gets as long as it needs
+                timeout=None if last else route.get('timeout', LLM_ROUTE_TIMEOUT),
+            )
+        except Exception as e:
+            error = e
+            if not last:
+                print(f"[ERROR] {stage or 'LLM'} request to '{model}' failed ({type(e).__name__}: {e}); "
+                      f"falling back to '{models[position + 1]}'")
+    raise error
+
+def _invoke_model(rendered, provider, model_name, output_format, temperature, parse, use_cache, stage):
+    cache = get_llm_cache() if use_cache else None
+    key = None
+    if cache is not None:
+        key = make_cache_key(provider, resolve_model_name(provider, model_name), temperature, output_format, rendered)
+        cached = cache.get(key)
+        if cached is not None:
+            return parse(cached) if parse else cached
+
+    def _invoke(base_url=None):
+        llm = get_llm(provider, model_name=model_name, output_format=output_format,
+                      temperature=temperature, base_url=base_url)
+        return (llm | StrOutputParser()).invoke(rendered)
+
+    if _is_ollama(provider):
+        call = lambda: get_ollama_pool().call(_invoke)
     else:
-        raise ValueError(f"Unsupported LLM provider: {provider}") 
\ No newline at end of file
+        call = _invoke
+    started = time.monotonic()
+    response = get_governor(provider).call(call, tokens=estimate_tokens(rendered))
+    _latencies.record((provider, stage), time.monotonic() - started)
+    result = parse(response) if parse else response
+    if cache is not None:
+        cache.set(key, response)
+    return result
+
+def _call_with_hedge(func, latency_key, hedge=False, timeout=None):
+    """
+    Runs func on the route executor and returns its result. With hedge, a duplicate
+    call starts once the first has run longer than the p95 latency recorded for
+    latency_key, and whichever finishes first wins. Raises TimeoutError after
+    `timeout` seconds, or the error of the last call to fail.
+    """
+    started = time.monotonic()
+    pending = {_route_executor.submit(func)}
+    hedge_at = None
+    if hedge:
+        p95 = _latencies.percentile(latency_key)
+        hedge_at = started + p95 if p95 is not None else None
+    error = None
+    while pending:
+        deadlines = [t for t in (hedge_at, started + timeout if timeout else None) if t is not None]
+        wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        now = time.monotonic()
+        if hedge_at is not None and now >= hedge_at and pending:
+            hedge_at = None
+            print(f"[DEBUG] Hedging slow {latency_key[1] or 'LLM'} request to '{latency_key[0]}'")
+            pending.add(_route_executor.submit(func))
+        if timeout and now - started >= timeout and pending:
+            raise TimeoutError(f"No response from '{latency_key[0]}' after {timeout}s")
+    raise error
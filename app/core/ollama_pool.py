@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+import urllib.request
+from typing import Any, Callable, List, Optional
+
+
+def is_connection_failure(error: BaseException) -> bool:
+    """
+    True when the error (or one it was raised from) means the server could not be
+    reached at all: refused or failed connections and connect timeouts. Read timeouts
+    and errors in the answer mean a live, possibly busy, server.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        name = type(error).__name__
+        if isinstance(error, (ConnectionRefusedError, ConnectionResetError, ConnectionAbortedError)) \
+                or name in ('ConnectError', 'ConnectTimeout', 'ConnectionError', 'NewConnectionError') \
+                or (isinstance(error, ConnectionError) and 'Timeout' not in name):
+            return True
+        # urllib's URLError keeps the underlying error in `reason`
+        reason = getattr(error, 'reason', None)
+        error = reason if isinstance(reason, BaseException) else error.__cause__ or error.__context__
+    return False
+
+
+class OllamaEndpoint:
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.healthy = True
+        self.checked = 0.0
+
+
+class OllamaPool:
+    """
+    A pool of Ollama servers. Each request goes to the healthy endpoint with the fewest
+    outstanding requests and fails over to the next one when the server cannot be
+    reached. Unreachable endpoints are skipped until a health check (GET /api/tags),
+    run at most every `health_interval` seconds, finds them up again; when every
+    endpoint is down, the one that failed least recently is still tried.
+    """
+
+    def __init__(self, urls: List[str], keep_alive: str = None, health_interval: float = 30.0,
+                 health_timeout: float = 2.0):
+        self.endpoints = [OllamaEndpoint(url) for url in urls]
+        self.keep_alive = keep_alive
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def check_health(self, endpoint: OllamaEndpoint) -> bool:
+        try:
+            with urllib.request.urlopen(f"{endpoint.url}/api/tags", timeout=self.health_timeout) as response:
+                healthy = response.status == 200
+        except Exception:
+            healthy = False
+        with self._lock:
+            endpoint.healthy = healthy
+            endpoint.checked = time.monotonic()
+        return healthy
+
+    def _candidates(self, excluded: set) -> List[OllamaEndpoint]:
+        now = time.monotonic()
+        with self._lock:
+            remaining = [e for e in self.endpoints if e.url not in excluded]
+            healthy = sorted((e for e in remaining if e.healthy), key=lambda e: e.outstanding)
+            due = [e for e in remaining if not e.healthy and now - e.checked >= self.health_interval]
+        # Down endpoints whose recheck is due come last, and only if they answer the health check
+        candidates = healthy + [e for e in due if self.check_health(e)]
+        if not candidates and remaining:
+            # Better a request to a server that was down a moment ago than no request at all
+            candidates = [min(remaining, key=lambda e: e.checked)]
+        return candidates
+
+    def call(self, func: Callable[[str], Any]) -> Any:
+        """
+        Runs func(base_url) on the least-loaded endpoint, failing over to the others on
+        connection failures, which also mark the endpoint down. Other errors (including
+        read timeouts on a busy server) are raised for the caller's retry policy. Raises
+        the last error when no endpoint could be reached.
+        """
+        tried = set()
+        last_error: Optional[Exception] = None
+        while True:
+            candidates = self._candidates(tried)
+            if not candidates:
+                if last_error is not None:
+                    raise last_error
+                raise ConnectionError("No healthy Ollama endpoint available")
+            endpoint = candidates[0]
+            tried.add(endpoint.url)
+            with self._lock:
+                endpoint.outstanding += 1
+            try:
+                return func(endpoint.url)
+            except Exception as e:
+                # Only unreachable servers are failed over; errors in the answer are the caller's business
+                if not is_connection_failure(e):
+                    raise
+                print(f"[ERROR] Ollama endpoint {endpoint.url} failed ({type(e).__name__}: {e}); failing over")
+                with self._lock:
+                    endpoint.healthy = False
+                    endpoint.checked = time.monotonic()
+                last_error = e
+            finally:
+                with self._lock:
+                    endpoint.outstanding -= 1
+
+    def preload(self, model: str) -> None:
+        """
+        Loads `model` on every endpoint in the background (an empty generate request)
+        with the pool's keep-alive, so the first real request does not pay the load time.
+        """
+        body = {"model": model}
+        if self.keep_alive:
+            body["keep_alive"] = self.keep_alive
+        data = json.dumps(body).encode('utf-8')
+
+        def _preload(endpoint):
+            request = urllib.request.Request(f"{endpoint.url}/api/generate", data=data,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(request, timeout=300) as response:
+                    response.read()
+                print(f"[DEBUG] Preloaded Ollama model '{model}' on {endpoint.url}")
+            except Exception as e:
+                print(f"[ERROR] Could not preload Ollama model '{model}' on {endpoint.url}: {e}")
+                if is_connection_failure(e):
+                    with self._lock:
+                        endpoint.healthy = False
+                        endpoint.checked = time.monotonic()
+
+        for endpoint in self.endpoints:
+            threading.Thread(target=_preload, args=(endpoint,), daemon=True).start()
+
+    def stats(self) -> List[dict]:
+        with self._lock:
+            return [{"url": e.url, "healthy": e.healthy, "outstanding": e.outstanding} for e in self.endpoints]
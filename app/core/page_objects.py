@@ -0,0 +1,216 @@
+import os
+import re
+from typing import Any, Dict, List, Optional
+from app.utils.to_snake_case import to_snake_case
+
+_ATTRIBUTE = re.compile(r'([A-Za-z_:][\w:.-]*)\s*=\s*("[^"]*"|\'[^\']*\'|[^\s"\'>]+)')
+_CSS_IDENT = re.compile(r'^[A-Za-z_][\w-]*$')
+_CAMEL_BOUNDARY = re.compile(r'(?<=[a-z0-9])(?=[A-Z])')
+_CLICK_INPUT_TYPES = {'submit', 'button', 'reset', 'checkbox', 'radio', 'image'}
+_PAGE_TYPES = ('form', 'button', 'input', 'select', 'textarea', 'a')
+# Element names whose locator constant would shadow a BasePage attribute (PATH)
+_RESERVED_NAMES = {'path'}
+
+_BASE = '''import os
+from urllib.parse import urljoin
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support import expected_conditions as EC
+
+BASE_URL = os.getenv("APP_URL", {base_url!r})
+
+
+class BasePage:
+    PATH = ""
+
+    def __init__(self, driver, timeout=10):
+        self.driver = driver
+        self.wait = WebDriverWait(driver, timeout)
+
+    def open(self):
+        self.driver.get(urljoin(BASE_URL.rstrip("/") + "/", self.PATH))
+        return self
+
+    def is_visible(self, locator):
+        return self.wait.until(EC.visibility_of_element_located(locator)).is_displayed()
+
+    def _fill(self, locator, text):
+        element = self.wait.until(EC.visibility_of_element_located(locator))
+        element.clear()
+        element.send_keys(text)
+        return self
+
+    def _click(self, locator):
+        self.wait.until(EC.element_to_be_clickable(locator)).click()
+        return self
+
+    def _select(self, locator, value):
+        select = Select(self.wait.until(EC.presence_of_element_located(locator)))
+        try:
+            select.select_by_visible_text(value)
+        except Exception:
+            select.select_by_value(value)
+        return self
+
+    def _submit(self, locator):
+        self.wait.until(EC.presence_of_element_located(locator)).submit()
+        return self
+'''
+
+
+def _attributes(snippet: str) -> Dict[str, str]:
+    return {name.lower(): value.strip('"\'') for name, value in _ATTRIBUTE.findall(snippet)}
+
+
+def _element(feature: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """Turns an extracted HTML feature into a page-object element (name, selector, action), if it can be located."""
+    tag = feature.get('type', '')
+    attributes = feature.get('attrs') or _attributes(str(feature.get('snippet', '')))
+    key = attributes.get('id') or attributes.get('data-testid') or attributes.get('name')
+    if not key:
+        return None
+    if attributes.get('id'):
+        value = attributes['id']
+        selector = f"#{value}" if _CSS_IDENT.match(value) else f"[id='{value}']"
+    elif attributes.get('data-testid'):
+        selector = f"[data-testid='{attributes['data-testid']}']"
+    else:
+        selector = f"{tag}[name='{attributes['name']}']"
+    if tag == 'form':
+        action = 'submit'
+    elif tag == 'select':
+        action = 'select'
+    elif tag in ('button', 'a') or (tag == 'input' and attributes.get('type', 'text').lower() in _CLICK_INPUT_TYPES):
+        action = 'click'
+    else:
+        action = 'fill'
+    name = to_snake_case(_CAMEL_BOUNDARY.sub('_', key)).strip('_') or tag
+    if name[0].isdigit():
+        name = f"{tag}_{name}"
+    return {"name": name, "selector": selector, "action": action}
+
+
+def _element_name(element: Dict[str, str]) -> str:
+    """The element's name in pages.py, prompts and compiled steps; reserved names get a _field suffix."""
+    name = element['name']
+    return f"{name}_field" if name in _RESERVED_NAMES else name
+
+
+def _class_name(location: str, taken: set) -> str:
+    stem = os.path.splitext(os.path.basename(location))[0] or 'index'
+    base = ''.join(part.capitalize() for part in re.split(r'[^A-Za-z0-9]+', stem) if part) or 'Index'
+    if base[0].isdigit():
+        base = f"Page{base}"
+    name = base if base.endswith('Page') else f"{base}Page"
+    suffix = 2
+    while name in taken:
+        name = f"{base}{suffix}Page"
+        suffix += 1
+    taken.add(name)
+    return name
+
+
+def build_page_objects(features: List[Dict[str, Any]], app_context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Groups the codebase's HTML features by file into page objects: a class name, the
+    page's path and its locatable elements (by id, data-testid or name) including the
+    controls of form features, each with the action its method performs (fill, click,
+    select or submit). Pages listed in the app
+    context without extracted features get an empty page object.
+    """
+    by_location: Dict[str, List[Dict[str, Any]]] = {}
+    for feature in features or []:
+        if isinstance(feature, dict) and feature.get('type') in _PAGE_TYPES:
+            by_location.setdefault(feature.get('location', ''), []).append(feature)
+    taken: set = set()
+    pages = []
+    for location, page_features in by_location.items():
+        elements, names, selectors = [], set(), set()
+        controls = [c for feature in page_features for c in [feature] + list(feature.get('children') or [])]
+        for feature in controls:
+            element = _element(feature)
+            if element is None or element['selector'] in selectors:
+                continue
+            # Names become the class's locator constants, so they are unique across all elements
+            base = name = _element_name(element)
+            suffix = 2
+            while name in names:
+                name = f"{base}_{suffix}"
+                suffix += 1
+            element['name'] = name
+            names.add(name)
+            selectors.add(element['selector'])
+            elements.append(element)
+        if elements:
+            pages.append({"class": _class_name(location, taken), "path": location.replace(os.sep, '/'), "elements": elements})
+    # Pages named in the app context ("login, dashboard" or paths) that have no extracted file
+    listed = [p.strip() for p in re.split(r'[,\n]', app_context.get('pages') or '') if p.strip()]
+    known = {to_snake_case(os.path.splitext(os.path.basename(page['path']))[0]) for page in pages}
+    for page in listed:
+        if to_snake_case(os.path.splitext(os.path.basename(page))[0]) not in known:
+            pages.append({"class": _class_name(page, taken), "path": page if '/' in page or '.' in page else '', "elements": []})
+    return pages
+
+
+def render_page_objects(pages: List[Dict[str, Any]], app_context: Dict[str, Any]) -> str:
+    """Renders the page objects as the suite's pages.py."""
+    lines = [_BASE.format(base_url=app_context.get('url') or '')]
+    for page in pages:
+        lines += ["", "", f"class {page['class']}(BasePage):", f"    PATH = {page['path']!r}"]
+        for element in page['elements']:
+            lines.append(f"    {_element_name(element).upper()} = (By.CSS_SELECTOR, {element['selector']!r})")
+        for element in page['elements']:
+            constant = f"self.{_element_name(element).upper()}"
+            method = f"{element['action']}_{_element_name(element)}"
+            if element['action'] in ('fill', 'select'):
+                argument = 'text' if element['action'] == 'fill' else 'value'
+                lines += ["", f"    def {method}(self, {argument}):", f"        return self._{element['action']}({constant}, {argument})"]
+            else:
+                lines += ["", f"    def {method}(self):", f"        return self._{element['action']}({constant})"]
+    return "\n".join(lines) + "\n"
+
+
+def pages_for_story(pages: List[Dict[str, Any]], story: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The page objects of the story's page: those whose file name or class matches the
+    story's page or URL. All pages when the story names none of them.
+    """
+    reference = f"{story.get('page') or ''} {story.get('url') or ''}".lower()
+    matched = []
+    for page in pages:
+        stem = os.path.splitext(os.path.basename(page['path']))[0].lower()
+        words = {stem, stem.replace('_', ' '), stem.replace('-', ' '), page['class'].lower()}
+        if page['path'] and page['path'].lower() in reference or any(w and re.search(rf'\b{re.escape(w)}\b', reference) for w in words):
+            matched.append(page)
+    return matched or pages
+
+
+def describe_page_objects(pages: List[Dict[str, Any]]) -> str:
+    """The page-object API in a compact form for prompts: one line per page with its methods and selectors."""
+    lines = []
+    for page in pages:
+        methods = []
+        for element in page['elements']:
+            argument = {'fill': 'text', 'select': 'value'}.get(element['action'], '')
+            methods.append(f"{element['action']}_{_element_name(element)}({argument}) [{element['selector']}]")
+        lines.append(f"{page['class']} (PATH {page['path']!r}): open(), is_visible(locator)"
+                     + (", " + ", ".join(methods) if methods else ""))
+    return "\n".join(lines)
+
+
+def normalize_selector(selector: str) -> str:
+    """Canonical form of a CSS selector for lookups: single quotes, collapsed whitespace."""
+    return " ".join(selector.replace('"', "'").split())
+
+
+def page_object_index(pages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Maps each element selector (normalized, see normalize_selector) to its page class
+    and element, for compiling steps against the page objects.
+    """
+    index = {}
+    for page in pages:
+        for element in page['elements']:
+            index.setdefault(normalize_selector(element['selector']),
+                             {"class": page['class'], **element, "name": _element_name(element)})
+    return index
@@ -0,0 +1,125 @@
+import queue
+import threading
+from app.core.config import PIPELINE_QUEUE_SIZE
+from app.core.llm_utils import get_max_concurrency
+from app.core.selenium_gen import _generate_script_for_story
+from app.core.user_story import iter_comprehensive_test_plan, assemble_test_plan
+
+_DONE = object()
+
+
+def _stories_of(event):
+    """Yields (epic name, index, story) for the stories a plan event carries."""
+    if event["event"] == "epic":
+        epic = event["epic"]
+        for position, story in enumerate(epic.get("stories", [])):
+            yield epic.get("epic"), position, story
+    elif event["event"] == "story":
+        yield event["epic"], event["index"], event["story"]
+
+
+def _put(target: queue.Queue, item, stop: threading.Event) -> bool:
+    """Puts item on a bounded queue, giving up (False) once the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def iter_plan_and_scripts(requirements, features, model_id, app_context, max_workers=None,
+                          queue_size=PIPELINE_QUEUE_SIZE, use_cache=True, page_objects=None,
+                          selector_index=None, **plan_options):
+    """
+    Generates the test plan and its scripts as one pipeline: every story is handed to
+    the script stages (steps, code, validation) through a bounded queue as soon as the
+    plan produces it, so scripts are generated while the rest of the plan still is.
+    Yields the iter_comprehensive_test_plan events interleaved with
+    {"event": "script", "epic": name, "index": i, "script": {...}} events, where
+    (epic, index) identify the story (its position in a requirement epic, or the
+    feature index of a feature story). A full queue pauses plan generation, and so
+    does a consumer that stops reading (the event queue is bounded too); closing the
+    generator (e.g. a disconnected client) stops the producer and script workers.
+    With page_objects the scripts are written against them and with selector_index their
+    selectors are checked (see iter_selenium_scripts).
+    Extra keyword arguments are passed on to iter_comprehensive_test_plan.
+    """
+    workers = max_workers or get_max_concurrency(model_id)
+    stories = queue.Queue(maxsize=max(1, queue_size))
+    events = queue.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for event in iter_comprehensive_test_plan(requirements, features, model_id, app_context,
+                                                      use_cache=use_cache, **plan_options):
+                if not _put(events, event, stop):
+                    return
+                for item in _stories_of(event):
+                    if not _put(stories, item, stop):
+                        return
+        except Exception as e:
+            _put(events, {"event": "error", "detail": str(e)}, stop)
+        finally:
+            for _ in range(workers):
+                _put(stories, _DONE, stop)
+
+    def consume():
+        while not stop.is_set():
+            try:
+                item = stories.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                break
+            epic_name, index, story = item
+            story = dict(story)
+            story.setdefault("url", app_context.get("url") or "YOUR_APP_URL_HERE")
+            try:
+                script = _generate_script_for_story(story, model_id, use_cache, page_objects=page_objects,
+                                                    selector_index=selector_index)
+            except Exception as e:
+                print(f"[ERROR] Script generation for story '{story.get('title')}' failed: {e}")
+                script = {"title": story.get("title", "unnamed_story"), "script": "",
+                          "status": "invalid", "errors": ["script generation failed"]}
+            if not _put(events, {"event": "script", "epic": epic_name, "index": index, "script": script}, stop):
+                return
+        _put(events, _DONE, stop)
+
+    threads = [threading.Thread(target=produce, daemon=True)]
+    threads += [threading.Thread(target=consume, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    finished = 0
+    try:
+        while finished < workers:
+            event = events.get()
+            if event is _DONE:
+                finished += 1
+            else:
+                yield event
+    finally:
+        # Reached on completion and when the generator is closed early
+        stop.set()
+
+
+def assemble_plan_and_scripts(events):
+    """
+    Builds {"test_plan": ..., "scripts": [...]} from iter_plan_and_scripts events,
+    with the scripts in the order of their stories in the plan.
+    """
+    plan_events = []
+    scripts = {}
+    for event in events:
+        if event["event"] == "script":
+            scripts[(event["epic"], event["index"])] = event["script"]
+        else:
+            plan_events.append(event)
+    epic_order = {}
+    for event in plan_events:
+        if event["event"] == "epic":
+            epic_order.setdefault(event["epic"].get("epic"), len(epic_order))
+    ordered = sorted(scripts.items(), key=lambda item: (epic_order.get(item[0][0], len(epic_order)), item[0][1]))
+    return {"test_plan": assemble_test_plan(plan_events), "scripts": [script for _, script in ordered]}
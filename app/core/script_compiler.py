@@ -0,0 +1,159 @@
+from typing import Any, Dict, List
+from urllib.parse import urljoin
+from app.core.page_objects import normalize_selector
+from app.utils.to_snake_case import to_snake_case
+
+SUPPORTED_ACTIONS = {"navigate", "click", "type", "select", "assert_text", "assert_element"}
+WAIT_SECONDS = 10
+
+_IMPORTS = '''import pytest
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import NoSuchElementException
+'''
+
+_DRIVER_FIXTURE = '''
+
+@pytest.fixture
+def driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    yield driver
+    driver.quit()
+'''
+
+_HELPERS = '''
+
+def _select_option(element, value):
+    # Match the visible label first, then the option value
+    select = Select(element)
+    try:
+        select.select_by_visible_text(value)
+    except NoSuchElementException:
+        select.select_by_value(value)
+'''
+
+
+def validate_steps(steps: Any) -> List[Dict[str, Any]]:
+    """Checks that steps follow the closed action schema; raises ValueError describing the first problem."""
+    if not isinstance(steps, list) or not steps:
+        raise ValueError("steps must be a non-empty list")
+    for number, step in enumerate(steps, 1):
+        if not isinstance(step, dict):
+            raise ValueError(f"step {number} is not an object")
+        action = step.get("action")
+        details = step.get("details")
+        if action not in SUPPORTED_ACTIONS:
+            raise ValueError(f"step {number} has unsupported action {action!r}")
+        if action in ("type", "select"):
+            key = "text" if action == "type" else "value"
+            if not isinstance(details, dict) or not isinstance(details.get("selector"), str) or key not in details:
+                raise ValueError(f"step {number} ({action}) needs a selector and {key}")
+        elif action == "navigate":
+            if details is not None and not isinstance(details, str):
+                raise ValueError(f"step {number} (navigate) needs a URL")
+        elif not isinstance(details, str) or not details.strip():
+            raise ValueError(f"step {number} ({action}) needs a non-empty string")
+    return steps
+
+
+def _comment(text: Any) -> str:
+    # Keep generated comments on one line whatever the step text contains
+    return "# " + " ".join(str(text).split())
+
+
+_PAGE_ACTIONS = {"click": "click", "type": "fill", "select": "select"}
+
+
+def _compile_page_step(step: Dict[str, Any], pages: Dict[str, Dict[str, Any]], instances: Dict[str, str]) -> List[str]:
+    """Compiles a step into a page-object call when its selector belongs to a known page element."""
+    action = step["action"]
+    details = step.get("details")
+    selector = details.get("selector") if isinstance(details, dict) else details
+    element = pages.get(normalize_selector(selector)) if isinstance(selector, str) else None
+    if element is None or _PAGE_ACTIONS.get(action) != element["action"]:
+        return []
+    lines = []
+    if element["class"] not in instances:
+        instances[element["class"]] = to_snake_case(element["class"]).strip("_")
+        lines.append(f"{instances[element['class']]} = {element['class']}(driver)")
+    method = f"{instances[element['class']]}.{element['action']}_{element['name']}"
+    if action == "type":
+        return lines + [f"{method}({str(details['text'])!r})"]
+    if action == "select":
+        return lines + [f"{method}({str(details['value'])!r})"]
+    return lines + [f"{method}()"]
+
+
+def _compile_step(step: Dict[str, Any], url: str) -> List[str]:
+    action = step["action"]
+    details = step.get("details")
+    if action == "navigate":
+        # Relative paths are resolved against the story's URL
+        target = urljoin(url, details.strip()) if details and details.strip() else url
+        return [_comment(f"Open {target}"), f"driver.get({target!r})"]
+    if action == "click":
+        return [
+            _comment(f"Click {details}"),
+            f"wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, {details!r}))).click()",
+        ]
+    if action == "type":
+        selector, text = details["selector"], str(details["text"])
+        return [
+            _comment(f"Type into {selector}"),
+            f"field = wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, {selector!r})))",
+            "field.clear()",
+            f"field.send_keys({text!r})",
+        ]
+    if action == "select":
+        selector, value = details["selector"], str(details["value"])
+        return [
+            _comment(f"Choose {value!r} in {selector}"),
+            f"_select_option(wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, {selector!r}))), {value!r})",
+        ]
+    if action == "assert_text":
+        return [
+            _comment(f"Expect the page to show {details!r}"),
+            f"assert wait.until(EC.text_to_be_present_in_element((By.TAG_NAME, \"body\"), {details!r}))",
+        ]
+    # assert_element
+    return [
+        _comment(f"Expect {details} to be visible"),
+        f"assert wait.until(EC.visibility_of_element_located((By.CSS_SELECTOR, {details!r})))",
+    ]
+
+
+def compile_steps(title: str, steps: Any, url: str, shared_fixtures: bool = False, logged_in: bool = False,
+                  pages: Dict[str, Dict[str, Any]] = None) -> str:
+    """
+    Compiles structured test steps into a runnable pytest + Selenium script with explicit
+    waits. Raises ValueError when the steps do not follow the schema, so callers can fall
+    back to LLM code generation.
+    With shared_fixtures the script relies on the suite's conftest.py for its `driver`
+    fixture instead of defining one; with logged_in it takes the `logged_in_driver`
+    fixture, so the steps should start after the login and the test stays on the page
+    the login state was restored on unless they start with a navigate. `pages` (see
+    page_objects.page_object_index) turns steps on known elements into calls to the
+    suite's page objects.
+    """
+    steps = validate_steps(steps)
+    if steps[0]["action"] != "navigate" and not logged_in:
+        steps = [{"action": "navigate", "details": url}] + steps
+    name = to_snake_case(title).strip("_") or "story"
+    body = ["driver = logged_in_driver"] if logged_in else []
+    body.append(f"wait = WebDriverWait(driver, {WAIT_SECONDS})")
+    instances: Dict[str, str] = {}
+    for step in steps:
+        page_lines = _compile_page_step(step, pages, instances) if pages else []
+        body.extend(page_lines or _compile_step(step, url))
+    header = _IMPORTS
+    if instances:
+        header += f"from pages import {', '.join(sorted(instances))}\n"
+    header += ("" if shared_fixtures else _DRIVER_FIXTURE) + _HELPERS
+    fixture = "logged_in_driver" if logged_in else "driver"
+    lines = [header, "", f"def test_{name}({fixture}):", f"    {_comment(title)}"]
+    lines.extend(f"    {line}" for line in body)
+    return "\n".join(lines) + "\n"
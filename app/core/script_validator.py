@@ -0,0 +1,92 @@
+import ast
+import builtins
+import re
+from typing import List
+
+_FENCE_PATTERN = re.compile(r'```[ \t]*(?:python|py)?[ \t]*\n(.*?)```', re.DOTALL | re.IGNORECASE)
+_CODE_START = ('import ', 'from ', 'def ', 'class ', '@', 'async def ')
+# Sentences and markdown: a word followed by more text, a list marker or a heading
+_PROSE_START = re.compile(r'^(?:[A-Za-z][\w\'’]*[ ,:]|[-*#>]|\d+[.)]\s)')
+# Names generated scripts commonly use that only exist once imported
+_IMPORTED_NAMES = {'pytest', 'webdriver', 'By', 'WebDriverWait', 'EC', 'expected_conditions', 'Select', 'Keys', 'ActionChains', 'time'}
+
+
+def _is_prose(line: str) -> bool:
+    """True for a trailing line of explanation: unindented text (or markdown) that isn't Python."""
+    stripped = line.strip()
+    if not stripped:
+        return True
+    if line[0].isspace() or not _PROSE_START.match(stripped):
+        return False
+    try:
+        ast.parse(stripped)
+        return False
+    except SyntaxError:
+        return True
+
+
+def extract_code(response: str) -> str:
+    """
+    Extracts the Python code from a free-form LLM response: the largest fenced block if
+    there is one, otherwise everything from the first code line on, minus trailing
+    prose. Code that doesn't parse is returned whole, so validation reports it.
+    """
+    blocks = _FENCE_PATTERN.findall(response)
+    if blocks:
+        return max(blocks, key=len).strip()
+    lines = response.strip().splitlines()
+    start = next((i for i, line in enumerate(lines) if line.lstrip().startswith(_CODE_START)), 0)
+    lines = lines[start:]
+    end = len(lines)
+    while end > 0 and _is_prose(lines[end - 1]):
+        end -= 1
+    return '\n'.join(lines[:end] or lines).strip()
+
+
+def _bound_names(tree: ast.AST) -> set:
+    bound = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            bound.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ClassDef):
+            bound.add(node.name)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            bound.add(node.name)
+            bound.update(arg.arg for arg in node.args.args + node.args.kwonlyargs)
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            bound.add(node.id)
+    return bound
+
+
+def validate_script(code: str) -> List[str]:
+    """
+    Checks a generated script without running it: it must parse, import everything it
+    uses from pytest/selenium and define at least one `test_` function. Returns the
+    problems found (empty when the script is valid).
+    """
+    if not code or not code.strip():
+        return ["script is empty"]
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return [f"syntax error on line {e.lineno}: {e.msg}"]
+    errors = []
+    imports_selenium = any(
+        (isinstance(node, ast.ImportFrom) and (node.module or '').startswith('selenium'))
+        or (isinstance(node, ast.Import) and any(alias.name.startswith('selenium') for alias in node.names))
+        for node in ast.walk(tree)
+    )
+    if not imports_selenium:
+        errors.append("script does not import selenium")
+    bound = _bound_names(tree)
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+    missing = sorted(name for name in used & _IMPORTED_NAMES if name not in bound and not hasattr(builtins, name))
+    if missing:
+        errors.append(f"missing imports for: {', '.join(missing)}")
+    has_test = any(
+        isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test_')
+        for node in ast.walk(tree)
+    )
+    if not has_test:
+        errors.append("no test_ function defined")
+    return errors
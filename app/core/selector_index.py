@@ -0,0 +1,357 @@
+import ast
+import difflib
+import re
+import zipfile
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+from app.core.config import SELECTOR_SUGGESTIONS
+from app.core.feature_extractor import iter_zip_sources
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+# One simple selector: tag or *, #id, .class, [attr op value], or a pseudo-class (not checked)
+_SIMPLE = re.compile(
+    r'\s*(?:(?P<tag>\*|[A-Za-z][\w-]*)|#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)'
+    r'|\[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?P<value>"[^"]*"|\'[^\']*\'|[^\]\s]+)\s*(?:[iIsS]\s*)?)?\]'
+    r'|(?P<pseudo>::?[\w-]+(?:\((?:[^()]|\([^()]*\))*\))?))'
+)
+_COMBINATOR = re.compile(r'\s*([>+~])\s*|\s+')
+# HTML fragments and DOM changes in JavaScript: elements, classes and ids it can add at runtime
+_JS_STRING = re.compile(r'"((?:[^"\\\n]|\\.)*)"|\'((?:[^\'\\\n]|\\.)*)\'|`((?:[^`\\]|\\.)*)`')
+_JS_CLASS = re.compile(r'classList\.(?:add|toggle|replace)\(([^)]*)\)|className\s*=\s*[\'"`]([^\'"`]*)')
+_JS_ID = re.compile(r'\.id\s*=\s*[\'"`]([^\'"`]+)|setAttribute\(\s*[\'"]id[\'"]\s*,\s*[\'"`]([^\'"`]+)')
+_QUOTED = re.compile(r'[\'"`]([^\'"`]+)[\'"`]')
+# Always present in a rendered page, even when the uploaded HTML is a fragment
+_DOCUMENT_TAGS = {'html', 'head', 'body'}
+# Locator strategies checked against the index; XPath and link texts are not
+_BY_KINDS = {'CSS_SELECTOR': 'css', 'ID': 'id', 'NAME': 'name', 'CLASS_NAME': 'class', 'TAG_NAME': 'tag'}
+
+
+class _Collector(HTMLParser):
+    """Appends the elements of one HTML document to an index, with their parent element."""
+
+    def __init__(self, index: "SelectorIndex", location: str):
+        super().__init__(convert_charrefs=True)
+        self.index = index
+        self.location = location
+        self.stack: List[int] = []
+
+    def handle_starttag(self, tag, attrs):
+        position = self.index._add_element(tag, dict(attrs), self.stack[-1] if self.stack else None, self.location)
+        if tag not in _VOID_TAGS:
+            self.stack.append(position)
+
+    def handle_startendtag(self, tag, attrs):
+        self.index._add_element(tag, dict(attrs), self.stack[-1] if self.stack else None, self.location)
+
+    def handle_endtag(self, tag):
+        # Close up to the matching element; stray end tags are ignored
+        for depth in range(len(self.stack) - 1, -1, -1):
+            if self.index.elements[self.stack[depth]]['tag'] == tag:
+                del self.stack[depth:]
+                break
+
+
+def _parse_selector(selector: str) -> Optional[List[tuple]]:
+    """
+    Parses one complex CSS selector (no commas) into [(combinator, [simple, ...]), ...],
+    left to right, where the first combinator is None. Returns None for syntax the
+    index does not check.
+    """
+    parts, combinator, position = [], None, 0
+    selector = selector.strip()
+    while position < len(selector):
+        simples = []
+        while position < len(selector):
+            match = _SIMPLE.match(selector, position)
+            if not match or match.end() == position or (simples and match.group(0)[:1].isspace()):
+                break
+            simples.append(match)
+            position = match.end()
+        if not simples:
+            return None
+        parts.append((combinator, simples))
+        if position >= len(selector):
+            break
+        match = _COMBINATOR.match(selector, position)
+        if not match or match.end() == position:
+            return None
+        combinator = match.group(1) or ' '
+        position = match.end()
+    return parts or None
+
+
+def _split_groups(selector: str) -> List[str]:
+    """Splits a selector list on the commas outside brackets, parentheses and quotes."""
+    groups, depth, quote, start = [], 0, None, 0
+    for position, char in enumerate(selector):
+        if quote:
+            quote = None if char == quote else quote
+        elif char in '"\'':
+            quote = char
+        elif char in '[(':
+            depth += 1
+        elif char in '])':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            groups.append(selector[start:position])
+            start = position + 1
+    groups.append(selector[start:])
+    return [group.strip() for group in groups if group.strip()]
+
+
+def _attribute_matches(actual: Optional[str], op: Optional[str], expected: str) -> bool:
+    if actual is None:
+        return False
+    if op is None:
+        return True
+    if op == '=':
+        return actual == expected
+    if op == '~=':
+        return expected in actual.split()
+    if op == '|=':
+        return actual == expected or actual.startswith(expected + '-')
+    if op == '^=':
+        return bool(expected) and actual.startswith(expected)
+    if op == '$=':
+        return bool(expected) and actual.endswith(expected)
+    return bool(expected) and expected in actual
+
+
+class SelectorIndex:
+    """
+    Index of the elements in a codebase's HTML (and the HTML fragments, ids and classes
+    its JavaScript adds), for checking generated selectors offline instead of finding
+    out from a browser timeout. Elements are indexed by id, class, name and tag; CSS
+    selectors are matched right to left against the element tree, with the results
+    cached per selector.
+    """
+
+    def __init__(self):
+        self.elements: List[Dict[str, Any]] = []
+        self.by_id: Dict[str, List[int]] = {}
+        self.by_class: Dict[str, List[int]] = {}
+        self.by_name: Dict[str, List[int]] = {}
+        self.by_tag: Dict[str, List[int]] = {}
+        self.children: Dict[Optional[int], List[int]] = {}
+        # Ids and classes only seen in JavaScript DOM manipulation, without an element
+        self.dynamic_ids: set = set()
+        self.dynamic_classes: set = set()
+        self._cache: Dict[str, Optional[bool]] = {}
+
+    @classmethod
+    def from_zip(cls, zip_ref: zipfile.ZipFile) -> "SelectorIndex":
+        """Builds the index from the HTML and JavaScript members of a codebase zip."""
+        index = cls()
+        for location, content in iter_zip_sources(zip_ref):
+            text = content.decode('utf-8', errors='ignore')
+            if location.endswith('.html'):
+                index.add_html(text, location)
+            elif location.endswith('.js'):
+                index.add_script(text, location)
+        return index
+
+    def _add_element(self, tag: str, attrs: Dict[str, Optional[str]], parent: Optional[int], location: str) -> int:
+        position = len(self.elements)
+        classes = (attrs.get('class') or '').split()
+        self.elements.append({"tag": tag, "attrs": attrs, "classes": classes, "parent": parent, "location": location})
+        self.children.setdefault(parent, []).append(position)
+        self.by_tag.setdefault(tag, []).append(position)
+        if attrs.get('id'):
+            self.by_id.setdefault(attrs['id'], []).append(position)
+        if attrs.get('name'):
+            self.by_name.setdefault(attrs['name'], []).append(position)
+        for name in classes:
+            self.by_class.setdefault(name, []).append(position)
+        self._cache.clear()
+        return position
+
+    def add_html(self, html: str, location: str) -> None:
+        collector = _Collector(self, location)
+        collector.feed(html)
+        collector.close()
+
+    def add_script(self, source: str, location: str) -> None:
+        for match in _JS_STRING.finditer(source):
+            literal = next(group for group in match.groups() if group is not None)
+            if '<' in literal and re.search(r'<[A-Za-z]', literal):
+                self.add_html(re.sub(r'\$\{[^}]*\}', '', literal), location)
+        for match in _JS_CLASS.finditer(source):
+            if match.group(1) is not None:
+                self.dynamic_classes.update(_QUOTED.findall(match.group(1)))
+            else:
+                self.dynamic_classes.update(match.group(2).split())
+        for match in _JS_ID.finditer(source):
+            self.dynamic_ids.add(match.group(1) or match.group(2))
+        self._cache.clear()
+
+    def _matches_compound(self, position: int, simples: List[re.Match]) -> bool:
+        element = self.elements[position]
+        for simple in simples:
+            if simple.group('tag') and simple.group('tag') != '*' and element['tag'] != simple.group('tag').lower():
+                return False
+            if simple.group('id') and element['attrs'].get('id') != simple.group('id'):
+                return False
+            if simple.group('cls') and simple.group('cls') not in element['classes']:
+                return False
+            if simple.group('attr'):
+                expected = (simple.group('value') or '').strip('"\'')
+                actual = element['attrs'].get(simple.group('attr').lower())
+                if simple.group('attr').lower() in element['attrs'] and actual is None:
+                    actual = ''
+                if not _attribute_matches(actual, simple.group('op'), expected):
+                    return False
+        return True
+
+    def _candidates(self, simples: List[re.Match]) -> List[int]:
+        for simple in simples:
+            if simple.group('id'):
+                return self.by_id.get(simple.group('id'), [])
+        for simple in simples:
+            if simple.group('cls'):
+                return self.by_class.get(simple.group('cls'), [])
+        for simple in simples:
+            if simple.group('attr') and simple.group('attr').lower() == 'name' and simple.group('op') == '=':
+                return self.by_name.get(simple.group('value').strip('"\''), [])
+        for simple in simples:
+            if simple.group('tag') and simple.group('tag') != '*':
+                return self.by_tag.get(simple.group('tag').lower(), [])
+        return range(len(self.elements))
+
+    def _matches_from(self, position: int, parts: List[tuple], last: int) -> bool:
+        """True when the element at `position` matches parts[last] and, through its combinator, the parts before it."""
+        combinator, simples = parts[last]
+        if not self._matches_compound(position, simples):
+            return False
+        if last == 0:
+            return True
+        parent = self.elements[position]['parent']
+        if combinator == '>':
+            if parent is None:
+                return self._implied_document(position, parts, last - 1)
+            return self._matches_from(parent, parts, last - 1)
+        if combinator == ' ':
+            root = position
+            while parent is not None:
+                if self._matches_from(parent, parts, last - 1):
+                    return True
+                root, parent = parent, self.elements[parent]['parent']
+            return self._implied_document(root, parts, last - 1)
+        siblings = self.children.get(parent, [])
+        before = [sibling for sibling in siblings if sibling < position]
+        if combinator == '+':
+            before = before[-1:]
+        return any(self._matches_from(sibling, parts, last - 1) for sibling in before)
+
+    def _implied_document(self, root: int, parts: List[tuple], last: int) -> bool:
+        """
+        True when `root` tops an HTML fragment (no <html>/<body> of its own) and parts[:last + 1]
+        only name the html/head/body elements the browser wraps fragments in.
+        """
+        if self.elements[root]['tag'] in _DOCUMENT_TAGS:
+            return False
+        return all(
+            simple.group('pseudo') or (simple.group('tag') or '').lower() in _DOCUMENT_TAGS
+            for _, simples in parts[:last + 1] for simple in simples
+        )
+
+    def _matches_dynamic(self, parts: List[tuple]) -> bool:
+        # Selectors built on ids/classes JavaScript assigns can't be matched structurally;
+        # accept them when everything they name exists somewhere and something is dynamic
+        dynamic = False
+        for _, simples in parts:
+            for simple in simples:
+                if simple.group('id'):
+                    if simple.group('id') in self.dynamic_ids:
+                        dynamic = True
+                    elif simple.group('id') not in self.by_id:
+                        return False
+                if simple.group('cls'):
+                    if simple.group('cls') in self.dynamic_classes:
+                        dynamic = True
+                    elif simple.group('cls') not in self.by_class:
+                        return False
+        return dynamic
+
+    def matches(self, selector: str) -> Optional[bool]:
+        """
+        True when some element matches the CSS selector (any selector of a comma list),
+        False when none does and None when the selector uses syntax that isn't checked.
+        """
+        if selector in self._cache:
+            return self._cache[selector]
+        result = False
+        for group in _split_groups(selector):
+            parts = _parse_selector(group)
+            if parts is None:
+                result = None
+                continue
+            last = len(parts) - 1
+            if any(self._matches_from(position, parts, last) for position in self._candidates(parts[last][1])) \
+                    or self._matches_dynamic(parts):
+                result = True
+                break
+        self._cache[selector] = result
+        return result
+
+    def suggest(self, selector: str, limit: int = SELECTOR_SUGGESTIONS) -> List[str]:
+        """The known ids, classes and names (as selectors) closest to the selector's last compound."""
+        group = (_split_groups(selector) or [selector])[0]
+        target = re.split(r'\s*[>+~]\s*|\s+', group.strip())[-1]
+        known = [f"#{name}" for name in list(self.by_id) + sorted(self.dynamic_ids)]
+        known += [f".{name}" for name in list(self.by_class) + sorted(self.dynamic_classes)]
+        known += [f"[name='{name}']" for name in self.by_name]
+        return difflib.get_close_matches(target, known, n=limit, cutoff=0.5)
+
+    def check_locator(self, kind: str, value: str) -> Optional[str]:
+        """
+        Checks one locator (kind is 'css', 'id', 'name', 'class' or 'tag'). Returns a
+        problem description with nearest-match suggestions, or None when it matches or
+        can't be checked.
+        """
+        if kind == 'css':
+            found = self.matches(value)
+        elif kind == 'id':
+            found = value in self.by_id or value in self.dynamic_ids
+        elif kind == 'name':
+            found = value in self.by_name
+        elif kind == 'class':
+            found = value in self.by_class or value in self.dynamic_classes
+        else:
+            found = value.lower() in self.by_tag
+        if found is not False:
+            return None
+        if kind in ('css', 'tag') and value.strip().lower() in _DOCUMENT_TAGS:
+            return None
+        selector = {'id': f"#{value}", 'class': f".{value}", 'name': f"[name='{value}']"}.get(kind, value)
+        suggestions = self.suggest(selector)
+        hint = f"; did you mean {', '.join(repr(s) for s in suggestions)}?" if suggestions else ""
+        return f"selector {selector!r} matches no element in the uploaded HTML{hint}"
+
+    def check_script(self, code: str) -> List[str]:
+        """
+        Checks every literal locator in a script, i.e. (By.<strategy>, "value") pairs in
+        calls and tuples. Returns one problem per unknown selector; scripts that don't
+        parse return none (validate_script reports them), and so does an index without
+        any elements (e.g. a JavaScript-only upload), which can't tell what exists.
+        """
+        if not self.elements:
+            return []
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return []
+        errors = []
+        for node in ast.walk(tree):
+            values = node.args if isinstance(node, ast.Call) else node.elts if isinstance(node, (ast.Tuple, ast.List)) else []
+            for by, value in zip(values, values[1:]):
+                if not (isinstance(by, ast.Attribute) and isinstance(by.value, ast.Name) and by.value.id == 'By'
+                        and by.attr in _BY_KINDS and isinstance(value, ast.Constant) and isinstance(value.value, str)):
+                    continue
+                error = self.check_locator(_BY_KINDS[by.attr], value.value)
+                if error and error not in errors:
+                    errors.append(error)
+        return errors
+
+    def stats(self) -> Dict[str, int]:
+        return {"elements": len(self.elements), "ids": len(self.by_id), "classes": len(self.by_class),
+                "names": len(self.by_name), "pages": len({element['location'] for element in self.elements})}
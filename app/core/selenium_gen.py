@@ -1,129 +1,236 @@
 import json
-from app.core.llm_utils import get_llm, PromptTemplate, StrOutputParser
+import logging
+from app.core.llm_utils import invoke_llm, parse_json_response, get_max_concurrency, PromptTemplate
+from app.core.config import APP_CONTEXT, COMPILE_STEPS_LOCALLY, SCRIPT_REPAIR_ATTEMPTS, SHARED_CONFTEST
+from app.core.conftest_gen import has_credentials, is_login_story, split_login_steps
+from app.core.page_objects import describe_page_objects, page_object_index, pages_for_story
+from app.core.script_compiler import compile_steps, validate_steps
+from app.core.script_validator import extract_code, validate_script
+from app.utils.concurrency import iter_concurrently
 
-# DEBUG: Add logging
-print("[DEBUG] selenium_gen.py loaded")
+logger = logging.getLogger(__name__)
 
-def generate_selenium_scripts(user_stories, model_id):
+def iter_selenium_scripts(user_stories, model_id, max_workers=None, use_cache=True, page_objects=None,
+                          selector_index=None):
+    """
+    Generates a script per user story and yields (index, script) pairs as each story
+    completes, where script is a dict with 'title', 'script', 'status' ('valid',
+    'repaired' or 'invalid') and 'errors'. Stories are processed concurrently, bounded
+    by the provider's in-flight limit (see LLM_MAX_CONCURRENCY); each script is
+    validated (and repaired if needed) by its own worker while the rest are generated.
+    With page_objects (see page_objects.build_page_objects) the prompts get the suite's
+    page-object API and the scripts are written against it. With selector_index (see
+    selector_index.SelectorIndex) scripts using selectors that match no element in the
+    uploaded HTML are sent back for repair.
+    """
+    workers = max_workers or get_max_concurrency(model_id)
+    for index, result in iter_concurrently(
+        lambda story: _generate_script_for_story(story, model_id, use_cache, page_objects=page_objects,
+                                                 selector_index=selector_index),
+        user_stories,
+        max_workers=workers,
+        label="Script generation for story",
+    ):
+        yield index, result or {
+            "title": user_stories[index].get("title", "unnamed_story"),
+            "script": "",
+            "status": "invalid",
+            "errors": ["script generation failed"],
+        }
+
+def generate_selenium_scripts(user_stories, model_id, max_workers=None, use_cache=True, page_objects=None,
+                              selector_index=None):
     """
     For each user story, generate test steps and then Selenium code using the LLM.
-    Returns a list of dicts with 'title' and 'script'.
+    Stories are processed concurrently, bounded by the provider's in-flight limit
+    (see LLM_MAX_CONCURRENCY). Returns a list of dicts with 'title', 'script',
+    'status' and 'errors' in the same order as the input stories. Set use_cache=False to bypass the
+    LLM response cache. With page_objects the scripts use the suite's page objects, with
+    selector_index their selectors are checked against the uploaded HTML.
     """
-    # DEBUG: Log received user stories
-    print(f"[DEBUG] Received user stories: {json.dumps(user_stories, indent=2)}")
     if isinstance(user_stories, str):
         user_stories = json.loads(user_stories)
-    scripts = []
-    for story in user_stories:
-        title = story.get("title", "unnamed_story")
-        description = story.get("description", "")
-        acceptance_criteria = story.get("acceptance_criteria", [])
-        url = story.get("url", "YOUR_APP_URL_HERE")
-        page = story.get("page", "the relevant page")
-        # 1. Generate test steps
-        steps_template = """
-            You are an expert in software testing and Selenium. Your task is to convert a user story and its acceptance criteria into a list of concrete, actionable steps for a Selenium test.
+    scripts = [None] * len(user_stories)
+    for index, script in iter_selenium_scripts(user_stories, model_id, max_workers=max_workers, use_cache=use_cache,
+                                               page_objects=page_objects, selector_index=selector_index):
+        scripts[index] = script
+    return scripts
 
-            Provide the output as a JSON array of objects, where each object has an "action" and "details".
-            Possible actions are: "navigate", "click", "type", "select", "assert_text", "assert_element".
-            - For "navigate", "details" should be the URL.
-            - For "click", "details" should be the CSS selector of the element to click.
-            - For "type", "details" should be a dictionary with "selector" (CSS selector) and "text".
-            - For "select", "details" should be a dictionary with "selector" (CSS selector) and "value".
-            - For "assert_text", "details" should be the text to check for on the page.
-            - For "assert_element", "details" should be the CSS selector of the element to verify its presence.
-            IMPORTANT: Your response must be a valid JSON array. Do not include any explanatory text.
-            Example format:
-            [
-                {{"action": "navigate", "details": "https://example.com"}},
-                {{"action": "type", "details": {{"selector": "#email", "text": "user@example.com"}}}}
-            ]
-            User Story:
-            Title: {title}
-            Description: {description}
-            Acceptance Criteria:
-            {acceptance_criteria}
-            Response (JSON array only):
-            """
-        steps_prompt = PromptTemplate(
-            template=steps_template,
-            input_variables=["title", "description", "acceptance_criteria"],
-        )
+def _generate_script_for_story(story, model_id, use_cache=True, compile_locally=COMPILE_STEPS_LOCALLY, page_objects=None,
+                               selector_index=None):
+    """Runs the steps -> code pipeline for a single user story."""
+    title = story.get("title", "unnamed_story")
+    description = story.get("description", "")
+    acceptance_criteria = story.get("acceptance_criteria", [])
+    url = story.get("url", "YOUR_APP_URL_HERE")
+    page = story.get("page", "the relevant page")
+    # Only the story's own page goes into the prompts
+    page_api = describe_page_objects(pages_for_story(page_objects, story)) if page_objects else ""
+    # 1. Generate test steps
+    steps_template = """
+        You are an expert in software testing and Selenium. Your task is to convert a user story and its acceptance criteria into a list of concrete, actionable steps for a Selenium test.
+
+        Provide the output as a JSON array of objects, where each object has an "action" and "details".
+        Possible actions are: "navigate", "click", "type", "select", "assert_text", "assert_element".
+        - For "navigate", "details" should be the URL.
+        - For "click", "details" should be the CSS selector of the element to click.
+        - For "type", "details" should be a dictionary with "selector" (CSS selector) and "text".
+        - For "select", "details" should be a dictionary with "selector" (CSS selector) and "value".
+        - For "assert_text", "details" should be the text to check for on the page.
+        - For "assert_element", "details" should be the CSS selector of the element to verify its presence.
+        IMPORTANT: Your response must be a valid JSON array. Do not include any explanatory text.
+        Example format:
+        [
+            {{"action": "navigate", "details": "https://example.com"}},
+            {{"action": "type", "details": {{"selector": "#email", "text": "user@example.com"}}}}
+        ]
+        User Story:
+        Title: {title}
+        Description: {description}
+        Acceptance Criteria:
+        {acceptance_criteria}
+        {pages_section}
+        Response (JSON array only):
+        """
+    steps_prompt = PromptTemplate(
+        template=steps_template,
+        input_variables=["title", "description", "acceptance_criteria", "pages_section"],
+    )
+    try:
+        test_steps = invoke_llm(steps_prompt, {
+            "title": title,
+            "description": description,
+            "acceptance_criteria": "\n".join(acceptance_criteria),
+            "pages_section": f"Known page elements (use these selectors where they apply):\n{page_api}" if page_api else "",
+        }, model_id, output_format='json', parse=parse_json_response, use_cache=use_cache, stage='steps')
+        if isinstance(test_steps, dict):
+            # JSON mode can force an object, e.g. {"steps": [...]}
+            test_steps = next((v for v in test_steps.values() if isinstance(v, list)), [])
+        logger.debug("Test steps for story '%s': %s", title, test_steps)
+    except Exception as e:
+        logger.error("Error generating test steps for story '%s': %s", title, e)
+        test_steps = []
+    # 2. Compile the steps locally; the LLM code call is only the fallback for missing or invalid steps
+    if compile_locally and test_steps:
         try:
-            llm = get_llm(model_id, output_format='json')
-            chain = steps_prompt | llm | StrOutputParser()
-            steps_response = chain.invoke({
-                "title": title,
-                "description": description,
-                "acceptance_criteria": "\n".join(acceptance_criteria),
-            })
-            cleaned_steps = steps_response.strip()
-            if cleaned_steps.startswith('```json'):
-                cleaned_steps = cleaned_steps[7:]
-            if cleaned_steps.endswith('```'):
-                cleaned_steps = cleaned_steps[:-3]
-            cleaned_steps = cleaned_steps.strip()
-            test_steps = json.loads(cleaned_steps)
-            # DEBUG: Log generated test steps
-            print(f"[DEBUG] Test steps for story '{title}': {json.dumps(test_steps, indent=2)}")
-        except Exception as e:
-            print(f"[ERROR] Error generating test steps for story '{title}': {e}")
-            test_steps = []
-        # 2. Generate Selenium code
-        code_template = '''
-            You are an expert Python Selenium test developer.
-            Given the following user story, acceptance criteria, and application context, generate a complete, runnable pytest-based Selenium test function.
-            - Use the provided URL and Page information directly in the script.
-            - Do not use placeholder values.
-            - Use best practices for waits, selectors, and assertions.
-            - Add comments explaining each step.
-            - Use clear and robust code.
+            login, steps = None, validate_steps(test_steps)
+            if SHARED_CONFTEST and has_credentials(APP_CONTEXT) and not is_login_story(title, description):
+                # Stories that only log in as setup reuse the suite's captured login state
+                login, steps = split_login_steps(steps, url)
+            final_code = compile_steps(title, steps, url, shared_fixtures=SHARED_CONFTEST, logged_in=login is not None,
+                                       pages=page_object_index(page_objects) if page_objects else None)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            logger.warning("Invalid test steps for story '%s', falling back to LLM code generation: %s", title, e)
+        else:
+            logger.debug("Compiled Selenium code for story '%s' from %d steps", title, len(test_steps))
+            result = _validate_and_repair(title, final_code, model_id, use_cache, selector_index=selector_index)
+            if login is not None:
+                # The login flow goes into the suite's conftest.py (see build_support_files)
+                result["login"] = login
+            return result
+    # 3. Generate Selenium code
+    code_template = '''
+        You are an expert Python Selenium test developer.
+        Given the following user story, acceptance criteria, and application context, generate a complete, runnable pytest-based Selenium test function.
+        - Use the provided URL and Page information directly in the script.
+        - Do not use placeholder values.
+        - Use best practices for waits, selectors, and assertions.
+        - Add comments explaining each step.
+        - Use clear and robust code.
 
-            Application Context:
-            URL: {url}
-            Page/Component: {page}
+        Application Context:
+        URL: {url}
+        Page/Component: {page}
 
-            User Story:
-            Title: {title}
-            Description: {description}
-            Acceptance Criteria:
-            {acceptance_criteria}
-            {steps_section}
-            Output only the Python code for the test (including imports and fixtures). No explanations.
-            '''
-        steps_section = f"Test Steps (optional):\n{json.dumps(test_steps, indent=2)}" if test_steps else ""
-        code_prompt = PromptTemplate(
-            template=code_template,
-            input_variables=["title", "description", "acceptance_criteria", "steps_section", "url", "page"],
+        User Story:
+        Title: {title}
+        Description: {description}
+        Acceptance Criteria:
+        {acceptance_criteria}
+        {steps_section}
+        {fixtures_section}
+        {page_objects_section}
+        Output only the Python code for the test (including imports and fixtures). No explanations.
+        '''
+    steps_section = f"Test Steps (optional):\n{json.dumps(test_steps, indent=2)}" if test_steps else ""
+    fixtures_section = ""
+    if SHARED_CONFTEST:
+        fixtures_section = (
+            "The suite's conftest.py provides the fixtures `driver` (a shared browser session, reset between tests) "
+            "and `logged_in_driver` (the same session, already logged in). Take one of them as the test function's "
+            "argument; do not define your own driver fixture and do not call driver.quit(). "
+            + ("" if is_login_story(title, description) or not has_credentials(APP_CONTEXT) else
+               "Use `logged_in_driver` instead of repeating the login steps when the test needs a logged-in user.")
         )
+    code_prompt = PromptTemplate(
+        template=code_template,
+        input_variables=["title", "description", "acceptance_criteria", "steps_section", "fixtures_section",
+                         "page_objects_section", "url", "page"],
+    )
+    try:
+        final_code = invoke_llm(code_prompt, {
+            "title": title,
+            "description": description,
+            "acceptance_criteria": "\n".join(acceptance_criteria),
+            "steps_section": steps_section,
+            "fixtures_section": fixtures_section,
+            "page_objects_section": (
+                "The suite's pages.py provides these page objects (methods return the page, so calls chain):\n"
+                f"{page_api}\nImport the ones you need from pages and call their methods instead of writing "
+                "locators and waits; keep the test short."
+            ) if page_api else "",
+            "url": url,
+            "page": page
+        }, model_id, parse=extract_code, use_cache=use_cache, stage='code')
+        logger.debug("Selenium code for story '%s':\n%s", title, final_code)
+    except Exception as e:
+        logger.error("Error generating selenium code for story '%s': %s", title, e)
+        final_code = ""
+    return _validate_and_repair(title, final_code, model_id, use_cache, selector_index=selector_index)
+
+def _check_script(code, selector_index=None):
+    """validate_script, plus the selectors matching nothing in the selector index once the script is valid Python."""
+    errors = validate_script(code)
+    if selector_index is not None and not any(error.startswith("syntax error") for error in errors):
+        errors += selector_index.check_script(code)
+    return errors
+
+def _validate_and_repair(title, code, model_id, use_cache=True, max_attempts=SCRIPT_REPAIR_ATTEMPTS, selector_index=None):
+    """
+    Validates a generated script (and, with a selector index, its selectors) and sends
+    failing ones back to the LLM, with the problems attached, for up to max_attempts
+    repairs. Returns the script dict with its validation status.
+    """
+    errors = _check_script(code, selector_index)
+    if not errors:
+        return {"title": title, "script": code, "status": "valid", "errors": []}
+    repair_template = """
+        You are an expert Python Selenium test developer.
+        The pytest-based Selenium test below fails validation with these problems:
+        {errors}
+
+        Fix the problems and return the complete corrected script (including imports and fixtures).
+        Keep the test's behaviour otherwise unchanged. Output only the Python code. No explanations.
+
+        Script:
+        {code}
+        """
+    repair_prompt = PromptTemplate(template=repair_template, input_variables=["errors", "code"])
+    for attempt in range(1, max_attempts + 1):
+        if not code.strip():
+            break
+        logger.debug("Repairing script for story '%s' (attempt %d): %s", title, attempt, errors)
         try:
-            llm = get_llm(model_id)
-            chain = code_prompt | llm | StrOutputParser()
-            code_response = chain.invoke({
-                "title": title,
-                "description": description,
-                "acceptance_criteria": "\n".join(acceptance_criteria),
-                "steps_section": steps_section,
-                "url": url,
-                "page": page
-            })
-            cleaned_code = code_response.strip()
-            code_lines = []
-            in_code = False
-            for line in cleaned_code.splitlines():
-                if not in_code and (line.strip().startswith('import') or line.strip().startswith('from') or line.strip().startswith('def') or line.strip().startswith('@')):
-                    in_code = True
-                if in_code:
-                    if line.strip().startswith('```') or line.strip().startswith('This code') or line.strip().startswith('The test') or line.strip().startswith('1.') or line.strip().startswith('*') or line.strip().startswith('# Run the test'):
-                        break
-                    code_lines.append(line)
-            final_code = '\n'.join(code_lines).strip()
-            # DEBUG: Log generated Selenium code
-            print(f"[DEBUG] Selenium code for story '{title}':\n{final_code}\n{'-'*40}")
+            repaired = invoke_llm(repair_prompt, {
+                "errors": "\n".join(f"- {error}" for error in errors),
+                "code": code,
+            }, model_id, parse=extract_code, use_cache=use_cache, stage='code')
         except Exception as e:
-            print(f"[ERROR] Error generating selenium code for story '{title}': {e}")
-            final_code = ""
-        scripts.append({"title": title, "script": final_code})
-    # DEBUG: Log all generated scripts
-    print(f"[DEBUG] All generated scripts: {json.dumps(scripts, indent=2)}")
-    return scripts 
\ No newline at end of file
+            logger.error("Error repairing selenium code for story '%s': %s", title, e)
+            break
+        repaired_errors = _check_script(repaired, selector_index)
+        if not repaired_errors:
+            return {"title": title, "script": repaired, "status": "repaired", "errors": []}
+        code, errors = repaired, repaired_errors
+    logger.warning("Script for story '%s' is invalid: %s", title, errors)
+    return {"title": title, "script": code, "status": "invalid", "errors": errors}
@@ -0,0 +1,441 @@
+import argparse
+import ast
+import importlib.util
+import inspect
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import xml.etree.ElementTree as ET
+import zipfile
+from contextlib import nullcontext
+from multiprocessing.util import Finalize
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote, unquote
+from app.core.config import SUITE_RUN_WORKERS
+from app.core.selector_index import SelectorIndex
+from app.utils.static_server import ZipStaticServer
+
+_URL_PATTERN = re.compile(r'file:///[^\s\'"]+|YOUR_APP_URL_HERE')
+
+# Per worker process: one reusable browser session, the test modules loaded so far,
+# the suite's conftest.py and the login state captured with it
+_driver = None
+_modules = {}
+_base_url = None
+_conftest = None
+_auth_state = None
+
+
+def rewrite_urls(code: str, base_url: str, members: List[str]) -> str:
+    """
+    Points a script at the local static server: file:// URLs whose path ends in a
+    codebase file (e.g. file:///C:/Users/me/app/sample.html#login) and the
+    YOUR_APP_URL_HERE placeholder are rewritten to URLs under base_url.
+    """
+    members = set(members)
+
+    def _replace(match):
+        url = match.group(0)
+        if url == 'YOUR_APP_URL_HERE':
+            return base_url + '/'
+        path, hash_sign, fragment = unquote(url[len('file://'):]).partition('#')
+        parts = path.replace('\\', '/').split('/')
+        # The longest tail of the local path that names a codebase file
+        for i in range(len(parts)):
+            suffix = '/'.join(parts[i:])
+            if suffix in members:
+                return f"{base_url}/{quote(suffix)}{hash_sign}{fragment}"
+        return url
+
+    return _URL_PATTERN.sub(_replace, code)
+
+
+# Generated next to the scripts: shared fixtures and the page objects the scripts import
+_SUPPORT_FILES = ('conftest.py', 'pages.py')
+
+
+def _is_suite_file(name: str) -> bool:
+    return name in _SUPPORT_FILES or (name.startswith('test_') and name.endswith('.py'))
+
+
+def _suite_sources(suite: str):
+    """Yields (file name, source) for the test_*.py scripts and support files of a suite directory or zip."""
+    if zipfile.is_zipfile(suite):
+        with zipfile.ZipFile(suite) as zip_ref:
+            for name in sorted(zip_ref.namelist()):
+                base = os.path.basename(name)
+                if _is_suite_file(base):
+                    yield base, zip_ref.read(name).decode('utf-8', errors='replace')
+        return
+    for base in sorted(os.listdir(suite)):
+        if _is_suite_file(base):
+            with open(os.path.join(suite, base), encoding='utf-8', errors='replace') as f:
+                yield base, f.read()
+
+
+def collect_tests(path: str, source: str) -> List[str]:
+    """Returns the test names in a script: top-level test_ functions and Class::test_ methods of Test classes."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return []
+    names = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test_'):
+            names.append(node.name)
+        elif isinstance(node, ast.ClassDef) and node.name.startswith('Test'):
+            names.extend(f"{node.name}::{item.name}" for item in node.body
+                         if isinstance(item, ast.FunctionDef) and item.name.startswith('test_'))
+    return names
+
+
+# Fixtures the pooled runner provides; other fixtures, parametrize and marks need pytest
+_FIXTURES = ('driver', 'logged_in_driver', 'base_url')
+
+
+def _decorator_name(node) -> str:
+    if isinstance(node, ast.Call):
+        node = node.func
+    try:
+        return ast.unparse(node)
+    except Exception:
+        return type(node).__name__
+
+
+def _unsupported_reason(func, decorators, method: bool) -> Optional[str]:
+    """Why the pooled runner cannot run a test function (None when it can)."""
+    if decorators:
+        return f"@{_decorator_name(decorators[0])} is not supported by the pooled runner; run this test with pytest"
+    args = func.args
+    names = [a.arg for a in args.posonlyargs + args.args]
+    if method and names:
+        names = names[1:]
+    required = names[:len(names) - len(args.defaults)] if args.defaults else names
+    required += [a.arg for a, default in zip(args.kwonlyargs, args.kw_defaults) if default is None]
+    for name in required:
+        if name not in _FIXTURES:
+            return f"fixture '{name}' is not provided by the pooled runner; run this test with pytest"
+    return None
+
+
+def unsupported_tests(source: str) -> Dict[str, str]:
+    """
+    Maps the tests of a script (named as in collect_tests) that the pooled runner cannot
+    run to the reason: decorated tests (parametrize, marks, usefixtures), tests in
+    decorated classes or modules with a pytestmark, and tests taking fixtures other
+    than driver, logged_in_driver and base_url.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return {}
+    module_marks = any(isinstance(node, (ast.Assign, ast.AnnAssign)) and any(
+        isinstance(target, ast.Name) and target.id == 'pytestmark'
+        for target in (node.targets if isinstance(node, ast.Assign) else [node.target]))
+        for node in tree.body)
+    reasons = {}
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith('test_'):
+            tests = [(node.name, node, node.decorator_list, False)]
+        elif isinstance(node, ast.ClassDef) and node.name.startswith('Test'):
+            tests = [(f"{node.name}::{item.name}", item, node.decorator_list + item.decorator_list, True)
+                     for item in node.body if isinstance(item, ast.FunctionDef) and item.name.startswith('test_')]
+        else:
+            continue
+        for name, func, decorators, method in tests:
+            if module_marks:
+                reason = "module-level pytestmark is not supported by the pooled runner; run this test with pytest"
+            else:
+                reason = _unsupported_reason(func, decorators, method)
+            if reason:
+                reasons[name] = reason
+    return reasons
+
+
+class _Unsupported(Exception):
+    """A test needs pytest features the pooled runner does not provide; it is reported as skipped."""
+
+
+def _new_driver():
+    from selenium import webdriver
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    return webdriver.Chrome(options=options)
+
+
+class _PooledDriver:
+    """
+    The driver handed to tests. quit() and closing the last window are ignored, so a
+    script that cleans up after itself does not end the shared session.
+    """
+
+    def __init__(self, driver):
+        self._driver = driver
+
+    def quit(self):
+        pass
+
+    def close(self):
+        if len(self._driver.window_handles) > 1:
+            self._driver.close()
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+
+def _reset(driver) -> None:
+    """Returns a session to a clean state between tests: one blank window, no cookies or storage."""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+    try:
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+    except Exception:
+        driver.delete_all_cookies()
+    try:
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except Exception:
+        pass
+    driver.get("about:blank")
+
+
+def _quit_driver():
+    global _driver
+    if _driver is not None:
+        try:
+            _driver.quit()
+        except Exception:
+            pass
+        _driver = None
+
+
+def _init_worker(suite_dir: str, base_url: Optional[str]):
+    global _base_url, _conftest
+    _base_url = base_url
+    if base_url:
+        # The generated conftest.py and pages.py read the app URL from the environment
+        os.environ["APP_URL"] = base_url
+    sys.path.insert(0, suite_dir)
+    conftest = os.path.join(suite_dir, 'conftest.py')
+    if os.path.exists(conftest):
+        _conftest = _load_module(conftest)
+    # Pool workers skip atexit handlers; a Finalize with an exit priority still runs on shutdown
+    Finalize(None, _quit_driver, exitpriority=10)
+
+
+def _load_module(path: str):
+    if path not in _modules:
+        name = f"suite_{len(_modules)}_{os.path.splitext(os.path.basename(path))[0]}"
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[path] = module
+    return _modules[path]
+
+
+def _resolve_test(module, name: str):
+    if '::' in name:
+        class_name, method = name.split('::', 1)
+        return getattr(getattr(module, class_name)(), method)
+    return getattr(module, name)
+
+
+def _outcome(error: BaseException) -> str:
+    # pytest.fail / pytest.skip raise these without us depending on pytest
+    name = type(error).__name__
+    if name == 'Skipped' or isinstance(error, _Unsupported):
+        return 'skipped'
+    if isinstance(error, AssertionError) or name in ('Failed', 'TimeoutException', 'NoSuchElementException'):
+        return 'failed'
+    return 'error'
+
+
+def _logged_in_driver():
+    """The pooled session with the suite's login state restored; the login itself runs once per worker."""
+    global _auth_state
+    if _conftest is None or not hasattr(_conftest, 'capture_state'):
+        raise _Unsupported("the logged_in_driver fixture needs the suite's generated conftest.py")
+    if _auth_state is None:
+        _conftest.login(_driver)
+        _auth_state = _conftest.capture_state(_driver)
+        _reset(_driver)
+    _conftest.restore_state(_driver, _auth_state)
+    return _PooledDriver(_driver)
+
+
+def _run_test(job):
+    """Runs one test on the worker's pooled session and returns its result."""
+    global _driver
+    path, name = job
+    result = {"file": os.path.basename(path), "test": name, "status": "passed", "message": "",
+              "setup_seconds": 0.0, "duration_seconds": 0.0}
+    try:
+        started = time.monotonic()
+        if _driver is None:
+            _driver = _new_driver()
+        func = _resolve_test(_load_module(path), name)
+        available = {"driver": lambda: _PooledDriver(_driver), "logged_in_driver": _logged_in_driver,
+                     "base_url": lambda: _base_url}
+        kwargs = {}
+        for parameter in inspect.signature(func).parameters.values():
+            if parameter.name in available:
+                kwargs[parameter.name] = available[parameter.name]()
+            elif parameter.default is inspect.Parameter.empty:
+                raise _Unsupported(f"fixture '{parameter.name}' is not provided by the pooled runner; "
+                                   "run this test with pytest")
+        result["setup_seconds"] = round(time.monotonic() - started, 3)
+        started = time.monotonic()
+        try:
+            func(**kwargs)
+        finally:
+            result["duration_seconds"] = round(time.monotonic() - started, 3)
+    except BaseException as e:
+        if isinstance(e, KeyboardInterrupt):
+            raise
+        result["status"] = _outcome(e)
+        if isinstance(e, _Unsupported):
+            result["message"] = str(e)
+        else:
+            result["message"] = f"{type(e).__name__}: {e}".strip()
+            result["traceback"] = traceback.format_exc(limit=-3)
+    if _driver is not None:
+        try:
+            _reset(_driver)
+        except Exception:
+            # The session is unusable (crashed browser, dead driver); start a new one next time
+            _quit_driver()
+    return result
+
+
+def summarize(results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    statuses = [r["status"] for r in results]
+    return {
+        "total": len(results),
+        "passed": statuses.count("passed"),
+        "failed": statuses.count("failed"),
+        "errors": statuses.count("error"),
+        "skipped": statuses.count("skipped"),
+        "test_seconds": round(sum(r["duration_seconds"] for r in results), 3),
+        "wall_seconds": round(wall_seconds, 3),
+    }
+
+
+def write_junit(report: Dict[str, Any], path: str, suite_name: str = "selenium_scripts") -> None:
+    """Writes a run report as JUnit XML (one testcase per test, grouped by file as classname)."""
+    summary = report["summary"]
+    suite = ET.Element("testsuite", name=suite_name, tests=str(summary["total"]),
+                       failures=str(summary["failed"]), errors=str(summary["errors"]),
+                       skipped=str(summary["skipped"]), time=str(summary["wall_seconds"]))
+    for result in report["tests"]:
+        case = ET.SubElement(suite, "testcase", classname=os.path.splitext(result["file"])[0],
+                             name=result["test"], time=str(result["duration_seconds"]))
+        if result["status"] in ("failed", "error"):
+            tag = "failure" if result["status"] == "failed" else "error"
+            ET.SubElement(case, tag, message=result["message"][:500]).text = result.get("traceback", "")
+        elif result["status"] == "skipped":
+            ET.SubElement(case, "skipped", message=result["message"][:500])
+    ET.ElementTree(suite).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def run_suite(suite: str, codebase_zip: Optional[str] = None, base_url: Optional[str] = None,
+              workers: int = SUITE_RUN_WORKERS, junit_path: Optional[str] = None,
+              json_path: Optional[str] = None, skip_unknown_selectors: bool = False) -> Dict[str, Any]:
+    """
+    Runs a generated suite (a directory or zip of test_*.py scripts) across `workers`
+    processes. Each process keeps one browser session and reuses it for every test it
+    runs, resetting it in between; the scripts' own driver fixtures are bypassed. Tests
+    taking `logged_in_driver` get the login state of the suite's conftest.py, captured
+    once per worker and restored for each test. Tests needing other pytest features
+    (parametrize, marks, other fixtures) are reported as skipped with the reason.
+    With codebase_zip, the codebase is served on a local static server and the
+    scripts' file:// and placeholder URLs are pointed at it, and each script's selectors
+    are first checked against the codebase's HTML (reported under "selector_errors");
+    with skip_unknown_selectors the tests of scripts with unknown selectors are skipped
+    instead of waiting for them to time out. Returns (and optionally writes) a report
+    with a summary and per-test status and timing.
+    """
+    work_dir = tempfile.mkdtemp(prefix="suite_")
+    try:
+        with (ZipStaticServer(codebase_zip) if codebase_zip else nullcontext()) as server:
+            if server is not None:
+                base_url = server.base_url
+            selector_index = None
+            if codebase_zip:
+                with zipfile.ZipFile(codebase_zip) as zip_ref:
+                    selector_index = SelectorIndex.from_zip(zip_ref)
+            jobs, skipped, selector_errors = [], [], {}
+            for file_name, source in _suite_sources(suite):
+                if base_url:
+                    source = rewrite_urls(source, base_url, server.members if server is not None else [])
+                path = os.path.join(work_dir, file_name)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(source)
+                if file_name in _SUPPORT_FILES:
+                    continue
+                errors = selector_index.check_script(source) if selector_index is not None else []
+                if errors:
+                    selector_errors[file_name] = errors
+                    print(f"[ERROR] {file_name}: " + "; ".join(errors))
+                unsupported = unsupported_tests(source)
+                for name in collect_tests(path, source):
+                    reason = errors[0] if errors and skip_unknown_selectors else unsupported.get(name)
+                    if reason:
+                        skipped.append({"file": file_name, "test": name, "status": "skipped", "message": reason,
+                                        "setup_seconds": 0.0, "duration_seconds": 0.0})
+                    else:
+                        jobs.append((path, name))
+            print(f"[DEBUG] Running {len(jobs)} tests on {workers} workers" + (f" against {base_url}" if base_url else ""))
+            started = time.monotonic()
+            results = list(skipped)
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(max(1, min(workers, len(jobs) or 1)), initializer=_init_worker,
+                              initargs=(work_dir, base_url)) as pool:
+                for result in pool.imap_unordered(_run_test, jobs):
+                    print(f"[{result['status'].upper()}] {result['file']}::{result['test']} ({result['duration_seconds']}s)")
+                    results.append(result)
+                pool.close()
+                pool.join()
+            results.sort(key=lambda r: (r["file"], r["test"]))
+            report = {"summary": summarize(results, time.monotonic() - started), "tests": results}
+            if selector_index is not None:
+                report["selector_errors"] = selector_errors
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if junit_path:
+        write_junit(report, junit_path)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a generated Selenium suite in parallel with pooled browser sessions.")
+    parser.add_argument("suite", help="directory or zip of generated test_*.py scripts")
+    parser.add_argument("--codebase", help="codebase zip to serve locally and point the scripts at")
+    parser.add_argument("--base-url", help="URL of an already running app (instead of --codebase)")
+    parser.add_argument("--workers", type=int, default=SUITE_RUN_WORKERS)
+    parser.add_argument("--junit", help="path of the JUnit XML report")
+    parser.add_argument("--json", help="path of the JSON report")
+    parser.add_argument("--skip-unknown-selectors", action="store_true",
+                        help="skip the tests of scripts whose selectors match nothing in the --codebase HTML")
+    args = parser.parse_args(argv)
+    report = run_suite(args.suite, codebase_zip=args.codebase, base_url=args.base_url, workers=args.workers,
+                       junit_path=args.junit, json_path=args.json, skip_unknown_selectors=args.skip_unknown_selectors)
+    print(json.dumps(report["summary"], indent=2))
+    summary = report["summary"]
+    return 1 if summary["failed"] or summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
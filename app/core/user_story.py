@@ -1,8 +1,20 @@
 import json
 import datetime
-from app.core.llm_utils import get_llm, PromptTemplate, StrOutputParser
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import (
+    LLM_CALL_TIMEOUT, FEATURE_STORY_BATCH_SIZE,
+    FEATURE_MATCH_TOP_K, FEATURE_MATCH_SKIP_LLM_CONFIDENCE, FEATURE_DEDUP_ENABLED,
+)
+from app.core.feature_dedup import cluster_features
+from app.core.feature_index import feature_key, get_feature_index
+from app.core.feature_ranker import rank_features
+from app.core.feature_codec import encode_features, decode_feature
+from app.core.llm_utils import (
+    invoke_llm, parse_json_response, get_max_concurrency, estimate_tokens, get_prompt_token_budget, PromptTemplate,
+)
+from app.utils.concurrency import iter_concurrently, run_concurrently
 
-def generate_user_stories(requirements, model_id, app_url, app_pages, username, password):
+def generate_user_stories(requirements, model_id, app_url, app_pages, username, password, use_cache=True):
     """
     Generates user stories in the required template from functional requirements using an LLM.
     Adds app_url, app_pages, username, and password to the prompt for technical context.
@@ -59,22 +71,13 @@ def generate_user_stories(requirements, model_id, app_url, app_pages, username,
     )
 
     try:
-        llm = get_llm(model_id, output_format='json')
-        chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({
+        data = invoke_llm(prompt, {
             "requirements": requirements,
             "app_url": app_url,
             "app_pages": app_pages,
             "username": username,
             "password": password
-        })
-        cleaned_response = response.strip()
-        if cleaned_response.startswith('```json'):
-            cleaned_response = cleaned_response[7:]
-        if cleaned_response.endswith('```'):
-            cleaned_response = cleaned_response[:-3]
-        cleaned_response = cleaned_response.strip()
-        data = json.loads(cleaned_response)
+        }, model_id, output_format='json', parse=parse_json_response, use_cache=use_cache, stage='backlog')
         # Post-process to ensure metadata is correct
         backlog = data.get('backlog', [])
         total_epics = len(backlog)
@@ -91,10 +94,114 @@ def generate_user_stories(requirements, model_id, app_url, app_pages, username,
         print(f"Error generating user stories: {e}")
         return None
 
-def match_requirements_to_features(requirements, features, model_id):
+def match_requirements_to_features(requirements, features, model_id, use_cache=True,
+                                   top_k=FEATURE_MATCH_TOP_K,
+                                   skip_llm_confidence=FEATURE_MATCH_SKIP_LLM_CONFIDENCE, failed_batches=None):
     """
-    Uses LLM to match user requirements to extracted codebase features.
+    Matches user requirements to extracted codebase features.
     Returns a list of matches with match_score (0-1).
+    When features is a list, every requirement is first ranked against every feature
+    locally (BM25) and only its top_k candidates are sent to the LLM. Requirements whose
+    best candidates reach `skip_llm_confidence` are matched locally without an LLM call.
+    Pass top_k=None to send every feature to the LLM. Either way, LLM input is split into
+    batches that fit the model's prompt token budget (see _match_in_batches); batches
+    whose LLM call failed are appended to the `failed_batches` list when one is given.
+    """
+    if not isinstance(features, list):
+        return _match_with_llm(requirements, features, model_id, use_cache)
+    if isinstance(requirements, str):
+        requirements = [r.strip() for r in requirements.split('\n') if r.strip()]
+    if not top_k:
+        return _match_in_batches(requirements, features, model_id, use_cache, failed_batches=failed_batches)
+
+    matches = []
+    remaining = []
+    candidates = {}
+    for requirement, ranked in zip(requirements, rank_features(requirements, features, top_k)):
+        confident = [
+            (index, confidence) for index, confidence in ranked
+            if skip_llm_confidence is not None and confidence >= skip_llm_confidence
+        ]
+        if confident:
+            matches.extend(
+                {"requirement": requirement, "feature": features[index], "match_score": round(confidence, 3)}
+                for index, confidence in confident
+            )
+            continue
+        remaining.append(requirement)
+        for index, _ in ranked:
+            candidates.setdefault(index, None)
+    if remaining and candidates:
+        matches.extend(_match_in_batches(remaining, [features[index] for index in candidates], model_id, use_cache,
+                                         failed_batches=failed_batches))
+    return matches
+
+def _split_by_budget(items: list, budget: int) -> list:
+    """Splits items into consecutive batches whose estimated prompt tokens stay within budget."""
+    batches, current, used = [], [], 0
+    for item in items:
+        tokens = estimate_tokens(item if isinstance(item, str) else encode_features([item])[0])
+        if current and used + tokens > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def _match_in_batches(requirements: list, features: list, model_id: str, use_cache: bool = True,
+                      token_budget: int = None, failed_batches: list = None) -> list:
+    """
+    Map-reduce matching: splits requirements and features into batches whose prompts fit
+    the token budget (default: get_prompt_token_budget for the model), matches every
+    requirement batch against every feature batch concurrently, and merges the results,
+    keeping the best match_score per (requirement, feature). Failed batches contribute no
+    matches; each is appended to `failed_batches` (when given) as
+    {"requirements": [...], "features": count} so callers can tell matching was incomplete.
+    """
+    jobs = _batch_jobs(requirements, features, token_budget or get_prompt_token_budget(model_id))
+    if len(jobs) > 1:
+        print(f"Matching in {len(jobs)} batches")
+    results = run_concurrently(
+        lambda job: _match_with_llm(job[0], job[1], model_id, use_cache, raise_errors=True),
+        jobs,
+        max_workers=get_max_concurrency(model_id),
+        label="Requirement matching batch",
+    )
+    best = {}
+    for (requirement_batch, feature_batch), batch_matches in zip(jobs, results):
+        if batch_matches is None:
+            if failed_batches is not None:
+                failed_batches.append({"requirements": requirement_batch, "features": len(feature_batch)})
+            continue
+        for match in batch_matches:
+            if not isinstance(match, dict):
+                continue
+            key = (str(match.get('requirement')), json.dumps(match.get('feature'), sort_keys=True))
+            try:
+                score = float(match.get('match_score', 0))
+            except (TypeError, ValueError):
+                score = 0.0
+            if key not in best or score > best[key][0]:
+                best[key] = (score, match)
+    return [match for _, match in best.values()]
+
+def _batch_jobs(requirements: list, features: list, budget: int) -> list:
+    """Pairs every requirement batch with every feature batch so each prompt fits the token budget."""
+    # Requirements get at most a quarter of the budget so every batch still has room for features
+    requirement_batches = _split_by_budget(requirements, max(1, budget // 4))
+    jobs = []
+    for requirement_batch in requirement_batches:
+        used = sum(estimate_tokens(r) for r in requirement_batch)
+        for feature_batch in _split_by_budget(features, max(1, budget - used)):
+            jobs.append((requirement_batch, feature_batch))
+    return jobs
+
+def _match_with_llm(requirements, features, model_id, use_cache=True, raise_errors=False):
+    """
+    Uses LLM to match user requirements to the given codebase features. A failed call
+    returns [] unless raise_errors is set.
     """
     template = '''
     You are an expert software analyst. Given the following user requirements and extracted codebase features, match each requirement to the most relevant feature(s) in the codebase. For each match, provide a match_score (0-1) indicating confidence.
@@ -102,12 +209,12 @@ def match_requirements_to_features(requirements, features, model_id):
     Requirements:
     {requirements}
 
-    Features:
+    Features (grouped under their file; each line is `ID type snippet`):
     {features}
 
     Output a JSON array of objects with:
       - requirement (string)
-      - feature (object)
+      - feature (string, the feature ID, e.g. "F3")
       - match_score (float, 0-1)
     Only output valid JSON, no explanation.
     '''
@@ -115,26 +222,27 @@ def match_requirements_to_features(requirements, features, model_id):
         template=template,
         input_variables=["requirements", "features"],
     )
+    # Free-text features (e.g. from /userstories/match) are passed through unchanged
+    encoded, mapping = encode_features(features) if isinstance(features, list) else (features, {})
     try:
-        llm = get_llm(model_id, output_format='json')
-        chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({
-            "requirements": requirements,
-            "features": features
-        })
-        cleaned_response = response.strip()
-        if cleaned_response.startswith('```json'):
-            cleaned_response = cleaned_response[7:]
-        if cleaned_response.endswith('```'):
-            cleaned_response = cleaned_response[:-3]
-        cleaned_response = cleaned_response.strip()
-        matches = json.loads(cleaned_response)
+        matches = invoke_llm(prompt, {
+            "requirements": "\n".join(requirements) if isinstance(requirements, list) else requirements,
+            "features": encoded
+        }, model_id, output_format='json', parse=parse_json_response, use_cache=use_cache, stage='matching')
+        if not isinstance(matches, list):
+            # Some models wrap the array in an object, e.g. {"matches": [...]}
+            matches = next((v for v in matches.values() if isinstance(v, list)), []) if isinstance(matches, dict) else []
+        for match in matches:
+            if isinstance(match, dict) and 'feature' in match:
+                match['feature'] = decode_feature(match['feature'], mapping)
         return matches
     except Exception as e:
         print(f"Error matching requirements to features: {e}")
+        if raise_errors:
+            raise
         return []
 
-def _generate_story_from_feature(feature: dict, model_id: str, app_context: dict) -> dict:
+def _generate_story_from_feature(feature: dict, model_id: str, app_context: dict, use_cache: bool = True) -> dict:
     """Uses LLM to generate a user story from a single codebase feature."""
     template = '''
     You are a test analyst. Given the following codebase feature and application context, write a concise user story in JSON format to test its functionality.
@@ -145,7 +253,7 @@ def _generate_story_from_feature(feature: dict, model_id: str, app_context: dict
     Application Context:
     Base URL: {app_url}
 
-    Codebase Feature:
+    Codebase Feature (file, then `ID type snippet`):
     {feature}
 
     Output only the JSON object for the story (no preamble or surrounding text). Example:
@@ -159,20 +267,10 @@ def _generate_story_from_feature(feature: dict, model_id: str, app_context: dict
     '''
     prompt = PromptTemplate(template=template, input_variables=["feature", "app_url"])
     try:
-        llm = get_llm(model_id, output_format='json')
-        chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({
-            "feature": json.dumps(feature),
+        story = invoke_llm(prompt, {
+            "feature": encode_features([feature])[0],
             "app_url": app_context.get("url", "")
-        })
-        
-        cleaned_response = response.strip()
-        if cleaned_response.startswith('```json'):
-            cleaned_response = cleaned_response[7:]
-        if cleaned_response.endswith('```'):
-            cleaned_response = cleaned_response[:-3]
-        
-        story = json.loads(cleaned_response)
+        }, model_id, output_format='json', parse=parse_json_response, use_cache=use_cache, stage='feature_stories')
         # Ensure essential keys are present
         story.setdefault("title", "Untitled Feature Test")
         story.setdefault("description", f"Test for feature at {feature.get('location')}")
@@ -183,72 +281,331 @@ def _generate_story_from_feature(feature: dict, model_id: str, app_context: dict
         print(f"Error generating story from feature: {e}")
         return None
 
-def create_comprehensive_test_plan(requirements: str, features: list, model_id: str, app_context: dict) -> dict:
+def _group_features_into_batches(features: list, batch_size: int) -> list:
     """
-    Orchestrates the creation of a comprehensive test plan by:
-    1. Matching requirements to features.
-    2. Generating stories from requirements, enriching them with matched feature data.
-    3. Generating stories for unmatched features.
+    Splits features into batches of at most `batch_size`, keeping features that
+    share a location and type together so each prompt covers related elements.
+    Returns lists of (index, feature) pairs, where index is the position in `features`.
+    """
+    groups = {}
+    for index, feature in enumerate(features):
+        key = (feature.get('location', ''), feature.get('type', ''))
+        groups.setdefault(key, []).append((index, feature))
+    batches = []
+    current = []
+    for key in sorted(groups):
+        for pair in groups[key]:
+            current.append(pair)
+            if len(current) >= batch_size:
+                batches.append(current)
+                current = []
+    if current:
+        batches.append(current)
+    return batches
+
+def _generate_stories_from_feature_batch(features: list, model_id: str, app_context: dict, use_cache: bool = True) -> list:
+    """
+    Uses LLM to generate one user story per feature for a batch of features in a single call.
+    Returns a list aligned with `features`; entries the model did not return are None.
+    """
+    template = '''
+    You are a test analyst. Given the following codebase features and application context, write one concise user story in JSON format per feature to test its functionality.
+    - Each story should include a title, a description (in the 'As a user...' format), and at least one acceptance criterion.
+    - The `page` should be the feature's location.
+    - The `url` should be the application's base URL, as it will be used for testing.
+    - The `id` must be the ID of the feature the story was written for.
+
+    Application Context:
+    Base URL: {app_url}
+
+    Codebase Features (grouped under their file; each line is `ID type snippet`):
+    {features}
+
+    Output only a JSON array with one story object per feature (no preamble or surrounding text). Example:
+    [
+      {{
+        "id": "F0",
+        "title": "Verify Login Form Submission",
+        "description": "As a user, I want to submit the login form to authenticate.",
+        "acceptance_criteria": ["The form submits successfully with valid credentials."],
+        "page": "src/login.html",
+        "url": "{app_url}"
+      }}
+    ]
+    '''
+    prompt = PromptTemplate(template=template, input_variables=["features", "app_url"])
+    # No dedupe: every feature needs its own story, keyed by its position ("F<i>")
+    encoded, _ = encode_features(features, dedupe=False)
+    stories = [None] * len(features)
+    try:
+        data = invoke_llm(prompt, {
+            "features": encoded,
+            "app_url": app_context.get("url", "")
+        }, model_id, output_format='json', parse=parse_json_response, use_cache=use_cache, stage='feature_stories')
+        # Some models wrap the array in an object, e.g. {"stories": [...]}
+        if isinstance(data, dict):
+            data = next((v for v in data.values() if isinstance(v, list)), [])
+        for story in data:
+            if not isinstance(story, dict):
+                continue
+            feature_id = str(story.pop("id", story.pop("index", "")))
+            index = int(feature_id.lstrip("F")) if feature_id.lstrip("F").isdigit() else -1
+            if not 0 <= index < len(features) or stories[index]:
+                continue
+            story.setdefault("title", "Untitled Feature Test")
+            story.setdefault("description", f"Test for feature at {features[index].get('location')}")
+            story.setdefault("acceptance_criteria", ["The feature works as expected."])
+            story.setdefault("url", app_context.get("url", ""))
+            stories[index] = story
+    except Exception as e:
+        print(f"Error generating stories from feature batch: {e}")
+    return stories
+
+def _iter_stories_for_features(features: list, model_id: str, app_context: dict,
+                               max_workers: int, timeout: float, batch_size: int, use_cache: bool = True):
     """
-    # 1. Match requirements to features
-    matches = match_requirements_to_features(requirements, features, model_id)
+    Generates a story per feature and yields (index, story) pairs as they complete,
+    where index is the position in `features` and story is None on failure.
+    With batch_size > 1, related features are packed into shared prompts; any
+    feature whose story is missing from a batch response is re-requested on its own.
+    """
+    def single(feature):
+        return _generate_story_from_feature(feature, model_id, app_context, use_cache=use_cache)
+
+    if batch_size <= 1:
+        yield from iter_concurrently(single, features, max_workers=max_workers, timeout=timeout,
+                                     label="Story generation for feature")
+        return
+
+    batches = _group_features_into_batches(features, batch_size)
+    missing = []
+    for batch_index, result in iter_concurrently(
+        lambda batch: _generate_stories_from_feature_batch([f for _, f in batch], model_id, app_context, use_cache),
+        batches,
+        max_workers=max_workers,
+        timeout=timeout,
+        label="Story generation for feature batch",
+    ):
+        result = result or [None] * len(batches[batch_index])
+        for (index, _), story in zip(batches[batch_index], result):
+            if story:
+                yield index, story
+            else:
+                missing.append(index)
+
+    if missing:
+        print(f"Re-requesting {len(missing)} feature stories individually")
+        for position, story in iter_concurrently(single, [features[i] for i in missing], max_workers=max_workers,
+                                                 timeout=timeout, label="Story generation for feature"):
+            yield missing[position], story
+
+def _enrich_story(story: dict, matches: list) -> None:
+    """Simple enrichment: add feature info to the description of a matched story (can be improved)."""
+    for match in matches:
+        if (
+            isinstance(match, dict)
+            and 'requirement' in match
+            and isinstance(match['requirement'], str)
+            and 'feature' in match
+            and isinstance(match['feature'], dict)
+        ):
+            if story.get('title', '').lower() in match['requirement'].lower():
+                story['description'] = story.get('description', '') + f"\n\n[Codebase reference: {match['feature'].get('type', 'Unknown')} at {match['feature'].get('location', 'Unknown')}]"
+                break  # Move to next story once enriched
+
+def _plan_features(requirements, features, model_id, app_context, use_cache=True, dedupe=FEATURE_DEDUP_ENABLED):
+    """
+    Runs the matching and backlog stages (yielding their progress events) and returns the
+    feature plan: {"matches", "backlog", "unmatched_features", "dedup_report",
+    "failed_match_batches"}, the last listing the matching batches whose LLM call failed.
+    """
+    # 1 & 2. Match requirements to features and generate stories from requirements
+    # (will be enriched later) in parallel.
+    # The existing `generate_user_stories` works well for the second part.
+    yield {"event": "progress", "stage": "matching", "status": "started"}
+    failed_batches = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        matches_future = executor.submit(match_requirements_to_features, requirements, features, model_id, use_cache,
+                                         failed_batches=failed_batches)
+        backlog_future = executor.submit(
+            generate_user_stories,
+            requirements, model_id,
+            app_context['url'], app_context['pages'],
+            app_context['username'], app_context['password'],
+            use_cache
+        )
+        matches = matches_future.result()
+        story_backlog = backlog_future.result()
+    yield {"event": "progress", "stage": "matching", "status": "completed", "matches": len(matches),
+           "failed_batches": len(failed_batches)}
+
     # Ensure matches is a list of dicts with expected keys
     matched_feature_locations = {
         match['feature']['location']
         for match in matches
         if isinstance(match, dict) and 'feature' in match and isinstance(match.get('feature'), dict) and match.get('feature').get('location') and match.get('match_score', 0) > 0.5
     }
-    
-    # 2. Generate stories from requirements (will be enriched later)
-    # The existing `generate_user_stories` works well for this part.
-    story_backlog = generate_user_stories(
-        requirements, model_id, 
-        app_context['url'], app_context['pages'], 
-        app_context['username'], app_context['password']
-    )
-    
+
     # 3. Generate stories for unmatched features
     unmatched_features = [f for f in features if f['location'] not in matched_feature_locations]
-    
-    unmatched_stories = []
-    for feature in unmatched_features:
-        story = _generate_story_from_feature(feature, model_id, app_context)
-        if story:
-            unmatched_stories.append(story)
-            
-    # 4. Combine the story lists
-    if story_backlog and 'backlog' in story_backlog:
-        if unmatched_stories:
-            # Add a new epic for "Existing Feature Tests"
-            story_backlog['backlog'].append({
-                "epic": "Existing Feature Tests",
-                "description": "Tests generated from existing codebase features not covered by requirements.",
-                "stories": unmatched_stories
-            })
-        
-        # Simple enrichment: add feature info to description of matched stories (can be improved)
+    dedup_report = None
+    if dedupe and unmatched_features:
+        # Only one representative per cluster of near-identical features gets a story
+        unmatched_features, dedup_report = cluster_features(unmatched_features)
+        print(f"Feature clustering: {dedup_report['features_before']} -> {dedup_report['features_after']} features")
+        yield {"event": "progress", "stage": "dedup", "status": "completed", **dedup_report}
+    return {"matches": matches, "backlog": story_backlog, "unmatched_features": unmatched_features,
+            "dedup_report": dedup_report, "failed_match_batches": failed_batches}
+
+def iter_comprehensive_test_plan(requirements: str, features: list, model_id: str, app_context: dict,
+                                 max_workers: int = None, timeout: float = LLM_CALL_TIMEOUT,
+                                 batch_size: int = FEATURE_STORY_BATCH_SIZE, use_cache: bool = True,
+                                 skip_feature_indices: set = None, dedupe: bool = FEATURE_DEDUP_ENABLED,
+                                 feature_plan: dict = None, on_feature_plan=None,
+                                 project_id: str = None, feature_diff: dict = None):
+    """
+    Builds a comprehensive test plan and yields it piece by piece as event dicts:
+    - {"event": "progress", "stage": ..., ...} as each stage starts and advances
+    - {"event": "epic", "epic": {...}} for every epic (requirement epics include their stories)
+    - {"event": "story", "epic": name, "index": i, "story": {...}} for each feature story as it
+      completes, where i is the feature's position among the unmatched (and, with dedupe,
+      clustered) features
+    - {"event": "metadata", "metadata": {...}} once everything has been generated
+    Steps are the same as in create_comprehensive_test_plan; see there for the parameters.
+    Once matching, backlog generation and clustering are done, their result (the feature
+    plan, see _plan_features) is passed to `on_feature_plan`. Given back as `feature_plan`,
+    those stages are skipped and the plan's unmatched features are used as they are, so
+    with `skip_feature_indices` (feature stories not to generate again) an interrupted
+    run resumes with its stored stories attached to the same features.
+    With a project_id, generated feature stories are stored with the project (see
+    FeatureIndex), and with its feature_diff only added or changed features get new
+    stories; the others reuse the story stored for them.
+    """
+    if feature_plan is None:
+        feature_plan = yield from _plan_features(requirements, features, model_id, app_context, use_cache, dedupe)
+        if on_feature_plan is not None:
+            on_feature_plan(feature_plan)
+    else:
+        yield {"event": "progress", "stage": "matching", "status": "completed",
+               "matches": len(feature_plan["matches"]), "resumed": True}
+    matches = feature_plan["matches"]
+    story_backlog = feature_plan["backlog"]
+    unmatched_features = feature_plan["unmatched_features"]
+    dedup_report = feature_plan["dedup_report"]
+
+    has_backlog = bool(story_backlog and 'backlog' in story_backlog)
+    if has_backlog:
         for epic in story_backlog.get('backlog', []):
             for story in epic.get('stories', []):
-                for match in matches:
-                    if (
-                        isinstance(match, dict)
-                        and 'requirement' in match
-                        and isinstance(match['requirement'], str)
-                        and 'feature' in match
-                        and isinstance(match['feature'], dict)
-                    ):
-                        if story['title'].lower() in match['requirement'].lower():
-                            story['description'] += f"\n\n[Codebase reference: {match['feature'].get('type', 'Unknown')} at {match['feature'].get('location', 'Unknown')}]"
-                            break  # Move to next story once enriched
-    else:
-        # Handle case where no requirements were provided, but features were found
-        story_backlog = {
-            "backlog": [{
-                "epic": "Existing Feature Tests",
-                "description": "Tests generated from existing codebase features.",
-                "stories": unmatched_stories
-            }],
-            "metadata": {}
-        }
-
-    return story_backlog 
\ No newline at end of file
+                _enrich_story(story, matches)
+            yield {"event": "epic", "epic": epic}
+
+    total = len(unmatched_features)
+    skip = skip_feature_indices or set()
+    pending = [index for index in range(total) if index not in skip]
+    reused = {}
+    if project_id and feature_diff is not None:
+        stored = get_feature_index().stories(project_id)
+        added = {feature_key(feature) for feature in feature_diff.get("added", [])}
+        for index in pending:
+            key = feature_key(unmatched_features[index])
+            if key in stored and key not in added:
+                reused[index] = stored[key]
+        pending = [index for index in pending if index not in reused]
+    yield {"event": "progress", "stage": "feature_stories", "status": "started",
+           "completed": total - len(pending) - len(reused), "total": total, "reused": len(reused)}
+
+    # 4. Stream the feature stories into an "Existing Feature Tests" epic, opened on the first story
+    # (or up front when no requirement backlog was produced, so the plan always has an epic)
+    epic_name = "Existing Feature Tests"
+    epic_opened = False
+    if not has_backlog or skip:
+        yield {"event": "epic", "epic": {
+            "epic": epic_name,
+            "description": "Tests generated from existing codebase features." if not has_backlog
+                           else "Tests generated from existing codebase features not covered by requirements.",
+            "stories": []
+        }}
+        epic_opened = True
+    completed = total - len(pending) - len(reused)
+
+    def _stories():
+        # Stored stories of unchanged features first, then the newly generated ones
+        for index in sorted(reused):
+            yield index, json.loads(json.dumps(reused[index]))
+        for position, story in _iter_stories_for_features(
+            [unmatched_features[index] for index in pending], model_id, app_context,
+            max_workers=max_workers or get_max_concurrency(model_id),
+            timeout=timeout,
+            batch_size=batch_size,
+            use_cache=use_cache,
+        ):
+            if story and project_id:
+                get_feature_index().put_story(project_id, unmatched_features[pending[position]], story)
+            yield pending[position], story
+
+    for index, story in _stories():
+        completed += 1
+        if story:
+            if not epic_opened:
+                yield {"event": "epic", "epic": {
+                    "epic": epic_name,
+                    "description": "Tests generated from existing codebase features not covered by requirements.",
+                    "stories": []
+                }}
+                epic_opened = True
+            _enrich_story(story, matches)
+            yield {"event": "story", "epic": epic_name, "index": index, "story": story}
+        yield {"event": "progress", "stage": "feature_stories", "status": "running", "completed": completed, "total": total}
+    yield {"event": "progress", "stage": "feature_stories", "status": "completed", "completed": completed, "total": total}
+
+    metadata = story_backlog.get('metadata', {}) if has_backlog else {}
+    if dedup_report:
+        metadata['feature_dedup'] = dedup_report
+    if feature_plan.get("failed_match_batches"):
+        # Requirements in these batches may be missing matches (and get feature stories they don't need)
+        metadata['failed_match_batches'] = feature_plan["failed_match_batches"]
+    yield {"event": "metadata", "metadata": metadata}
+
+def create_comprehensive_test_plan(requirements: str, features: list, model_id: str, app_context: dict,
+                                   max_workers: int = None, timeout: float = LLM_CALL_TIMEOUT,
+                                   batch_size: int = FEATURE_STORY_BATCH_SIZE, use_cache: bool = True,
+                                   dedupe: bool = FEATURE_DEDUP_ENABLED, project_id: str = None,
+                                   feature_diff: dict = None) -> dict:
+    """
+    Orchestrates the creation of a comprehensive test plan by:
+    1. Matching requirements to features.
+    2. Generating stories from requirements, enriching them with matched feature data.
+    3. Generating stories for unmatched features.
+    Steps 1 and 2 are independent and run at the same time. Step 3 fans out over
+    a bounded pool of `max_workers` (default: the provider's in-flight limit),
+    with each call limited to `timeout` seconds and up to `batch_size` features
+    packed into each prompt. With dedupe, near-duplicate unmatched features are clustered
+    first and only one representative per cluster gets a story.
+    Set use_cache=False to bypass the LLM response cache. With a project_id and its
+    feature_diff, unchanged features reuse the project's stored stories.
+    """
+    return assemble_test_plan(iter_comprehensive_test_plan(
+        requirements, features, model_id, app_context,
+        max_workers=max_workers, timeout=timeout,
+        batch_size=batch_size, use_cache=use_cache, dedupe=dedupe,
+        project_id=project_id, feature_diff=feature_diff
+    ))
+
+def assemble_test_plan(events) -> dict:
+    """Builds the test plan dict from iter_comprehensive_test_plan events."""
+    story_backlog = {"backlog": [], "metadata": {}}
+    epics = {}
+    feature_stories = {}
+    for event in events:
+        if event["event"] == "epic":
+            story_backlog["backlog"].append(event["epic"])
+            epics[event["epic"].get("epic")] = event["epic"]
+        elif event["event"] == "story":
+            feature_stories.setdefault(event["epic"], []).append((event["index"], event["story"]))
+        elif event["event"] == "metadata":
+            story_backlog["metadata"] = event["metadata"]
+    # Feature stories arrive in completion order; keep them in feature order for a stable plan
+    for epic_name, stories in feature_stories.items():
+        epics[epic_name].setdefault("stories", []).extend(story for _, story in sorted(stories, key=lambda pair: pair[0]))
+    return story_backlog
@@ -4,8 +4,10 @@ from app.api import (
     routes_models, routes_requirements, 
     routes_codebase, routes_userstories, 
     routes_scripts, routes_app_context,
-    routes_test_plan
+    routes_test_plan, routes_cache, routes_jobs
 )
+from app.core.llm_utils import warm_up_llm_clients
+from app.core.jobs import get_job_manager
 
 
 def create_app() -> FastAPI:
@@ -24,6 +26,10 @@ def create_app() -> FastAPI:
     app.include_router(routes_codebase.router)
     app.include_router(routes_userstories.router)
     app.include_router(routes_scripts.router)
+    app.include_router(routes_cache.router)
+    app.include_router(routes_jobs.router)
+    app.add_event_handler("startup", warm_up_llm_clients)
+    app.add_event_handler("startup", lambda: get_job_manager().resume_interrupted())
     return app
 
 app = create_app() 
\ No newline at end of file
@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+class CacheStatsResponse(BaseModel):
+    enabled: bool
+    hits: int = 0
+    misses: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+class CacheClearResponse(BaseModel):
+    message: str
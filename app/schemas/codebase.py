@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Any
+from typing import List, Any, Optional
 
 class CodebaseUploadResponse(BaseModel):
     message: str
@@ -8,4 +8,5 @@ class CodebaseUploadResponse(BaseModel):
 
 class CodebaseAnalysisResponse(BaseModel):
     message: str
-    features: List[Any] 
\ No newline at end of file
+    features: List[Any]
+    feature_diff: Optional[Any] = None 
\ No newline at end of file
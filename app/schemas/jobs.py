@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+class JobSubmitResponse(BaseModel):
+    message: str
+    job_id: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str
+    status: str
+    progress: Dict[str, Any]
+    error: Optional[str] = None
+
+class JobResultResponse(BaseModel):
+    job_id: str
+    status: str
+    result: Any
@@ -1,9 +1,16 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional
+
+class StageRoute(BaseModel):
+    model: str
+    fallback: Optional[str] = None
+    hedge: bool = False
+    timeout: Optional[float] = None
 
 class ModelInfo(BaseModel):
     name: str
     id: str
+    stages: Optional[Dict[str, StageRoute]] = None
 
 class ModelListResponse(BaseModel):
     models: List[ModelInfo]
@@ -16,4 +23,13 @@ class ModelSelectionResponse(BaseModel):
     selected_model_id: str
     
 class CurrentModelResponse(BaseModel):
-    selected_model_id: str 
\ No newline at end of file
+    selected_model_id: str 
+
+class RoutingProfileRequest(BaseModel):
+    id: str
+    name: str
+    stages: Dict[str, StageRoute]
+
+class RoutingProfileResponse(BaseModel):
+    message: str
+    profile: ModelInfo
@@ -4,6 +4,9 @@ from typing import Any, Optional
 class ScriptGenerationRequest(BaseModel):
     user_stories: Any
     model_id: Optional[str] = None
+    use_cache: bool = True
+    # Extracted codebase features; when given, the scripts are written against generated page objects
+    features: Optional[Any] = None
 
 class ScriptGenerationResponse(BaseModel):
     message: str
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+
+def iter_concurrently(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int,
+    timeout: Optional[float] = None,
+    label: str = "task",
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Runs func over items on a bounded thread pool and yields (index, result) pairs
+    in completion order. A call that raises, or runs longer than `timeout` seconds,
+    yields None without holding up the others. Timed-out calls are abandoned, not
+    interrupted.
+    """
+    items = list(items)
+    if not items:
+        return
+    started = {}
+
+    def _run(index, item):
+        started[index] = time.monotonic()
+        return func(item)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {executor.submit(_run, index, item): index for index, item in enumerate(items)}
+        pending = set(futures)
+        while pending:
+            wait_for = None
+            if timeout is not None:
+                now = time.monotonic()
+                deadlines = [started[futures[f]] + timeout - now for f in pending if futures[f] in started]
+                wait_for = max(0.0, min(deadlines)) if deadlines else timeout
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"[ERROR] {label} {index} failed: {e}")
+                    result = None
+                yield index, result
+            if timeout is not None:
+                now = time.monotonic()
+                for future in list(pending):
+                    index = futures[future]
+                    if index in started and now - started[index] > timeout:
+                        print(f"[ERROR] {label} {index} timed out after {timeout}s")
+                        pending.discard(future)
+                        yield index, None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_concurrently(
+    func: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_workers: int,
+    timeout: Optional[float] = None,
+    label: str = "task",
+) -> List[Any]:
+    """Like iter_concurrently, but waits for every call and returns the results in input order."""
+    items = list(items)
+    results: List[Any] = [None] * len(items)
+    for index, result in iter_concurrently(func, items, max_workers, timeout=timeout, label=label):
+        results[index] = result
+    return results
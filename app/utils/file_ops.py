@@ -1,3 +1,4 @@
+import json
 import os
 import zipfile
 from .to_snake_case import to_snake_case
@@ -11,8 +12,11 @@ def save_script(story_title: str, content: str, directory: str = "scripts"):
         f.write(content)
     return path
 
-def zip_scripts(scripts: list, directory: str = "scripts", zip_name: str = "selenium_scripts.zip") -> str:
-    """Saves and zips a list of generated scripts."""
+def zip_scripts(scripts: list, directory: str = "scripts", zip_name: str = "selenium_scripts.zip", support_files: dict = None) -> str:
+    """
+    Saves and zips a list of generated scripts, with a validation report when the scripts
+    carry a status and the suite's support files (file name -> content, e.g. conftest.py).
+    """
     os.makedirs(directory, exist_ok=True)
     script_paths = []
     for script in scripts:
@@ -23,5 +27,13 @@ def zip_scripts(scripts: list, directory: str = "scripts", zip_name: str = "sele
     with zipfile.ZipFile(zip_path, 'w') as zipf:
         for script_path in script_paths:
             zipf.write(script_path, arcname=os.path.basename(script_path))
+        report = [
+            {"file": os.path.basename(path), "title": script['title'], "status": script['status'], "errors": script.get('errors', [])}
+            for script, path in zip(scripts, script_paths) if 'status' in script
+        ]
+        if report:
+            zipf.writestr("validation_report.json", json.dumps(report, indent=2))
+        for name, content in (support_files or {}).items():
+            zipf.writestr(name, content)
     
     return zip_path 
\ No newline at end of file
@@ -0,0 +1,60 @@
+import mimetypes
+import posixpath
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+class ZipStaticServer:
+    """
+    Serves the members of a codebase zip over HTTP on localhost, read on demand
+    (nothing is extracted). Directory paths fall back to their index.html.
+    Use as a context manager; `base_url` is set while the server runs.
+    """
+
+    def __init__(self, zip_path: str, host: str = "127.0.0.1", port: int = 0):
+        self.zip_path = zip_path
+        self.host = host
+        self.port = port
+        self.base_url = None
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        zip_ref = zipfile.ZipFile(self.zip_path)
+        members = {name: name for name in zip_ref.namelist() if not name.endswith('/')}
+        lock = threading.Lock()
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = posixpath.normpath(unquote(urlsplit(self.path).path)).lstrip('/')
+                path = '' if path == '.' else path
+                for candidate in (path, posixpath.join(path, 'index.html')):
+                    if candidate in members:
+                        with lock:
+                            body = zip_ref.read(members[candidate])
+                        self.send_response(200)
+                        self.send_header("Content-Type", mimetypes.guess_type(candidate)[0] or "application/octet-stream")
+                        self.send_header("Content-Length", str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+                self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._zip = zip_ref
+        self.members = list(members)
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self.base_url = f"http://{self.host}:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._zip.close()
+        return False